@@ -24,14 +24,17 @@ import asyncio
 import argparse
 import threading
 import bittensor as bt
-from typing import List, Literal
+from typing import List
 from traceback import print_exception
 
 from hip.base.neuron import BaseNeuron
 from hip.mock import MockDendrite
 from hip.utils.config import add_validator_args
 from hip.utils.misc import get_utc_timestamp
-from hip.validator.reward import linear_rewards
+from hip.validator.reward import miner_scores
+from hip.validator.event_loop import EventLoopLagMonitor
+from hip.validator.history import TaskHistory, min_history_capacity
+from hip.validator.state_journal import StateJournal
 
 
 class BaseValidatorNeuron(BaseNeuron):
@@ -60,11 +63,23 @@ class BaseValidatorNeuron(BaseNeuron):
         self.scores = torch.zeros(
             self.metagraph.n, dtype=torch.float32, device=self.device  # type: ignore
         )  # type: ignore
-        # tasks_history is a list of lists, where each list contains tuples of the form (is_answer_correct: bool, timestamp: int, question_type: Literal["captcha", "normal"]) for each question answered by a miner.
-        # the base list is indexed by the miner's uid. len(self.metagraph.uids) is the length of the list.
-        self.tasks_history: list[
-            list[tuple[bool, int, Literal["captcha", "normal"]]]
-        ] = [[] for _ in range(self.metagraph.n)]
+        # Keep every answer of the scoring window at the configured task rate.
+        min_capacity = min_history_capacity(
+            float(self.config.neuron.task_gen_step), self.config.neuron.num_concurrent_forwards  # type: ignore
+        )
+        if self.config.neuron.history_capacity < min_capacity:  # type: ignore
+            bt.logging.warning(
+                f"--neuron.history_capacity {self.config.neuron.history_capacity} is too small "  # type: ignore
+                f"for the task rate, using {min_capacity}"
+            )
+            self.config.neuron.history_capacity = min_capacity  # type: ignore
+        # tasks_history holds, for each miner's uid, whether each answer was correct, its timestamp and its task type.
+        self.tasks_history = TaskHistory(
+            self.metagraph.n, capacity=self.config.neuron.history_capacity  # type: ignore
+        )
+        self.state_journal = StateJournal(
+            self.config.neuron.full_path, self.config.neuron.snapshot_interval  # type: ignore
+        )
         # Init sync with the network. Updates the metagraph.
         self.sync()
 
@@ -110,7 +125,16 @@ class BaseValidatorNeuron(BaseNeuron):
         coroutines = [
             self.forward() for _ in range(self.config.neuron.num_concurrent_forwards)  # type: ignore
         ]
-        await asyncio.gather(*coroutines)
+        # Measure how long the event loop is blocked while the forwards run.
+        monitor = EventLoopLagMonitor()
+        monitor_task = asyncio.ensure_future(monitor.run())
+        try:
+            await asyncio.gather(*coroutines)
+        finally:
+            monitor.stop()
+            await monitor_task
+        monitor.log()
+        self.event_loop_lag = monitor.max_lag
 
     def run(self):
         """
@@ -304,7 +328,7 @@ class BaseValidatorNeuron(BaseNeuron):
                 bt.logging.debug(f"Hotkey {hotkey} has been replaced.")
                 bt.logging.debug(f"self.score: Zeroing out score for uid {uid}")
                 self.scores[uid] = 0  # hotkey has been replaced
-                self.tasks_history[uid] = []  # clear rewards log
+                self.tasks_history.reset(uid)  # clear rewards log
 
         # Check to see if the metagraph has changed size.
         # If so, we need to add new hotkeys and scores.
@@ -319,12 +343,7 @@ class BaseValidatorNeuron(BaseNeuron):
             all_scores[:min_len] = self.scores[:min_len]
             self.scores = all_scores
             # Update the size of the tasks_history.
-            all_tasks_history: list[
-                list[tuple[bool, int, Literal["captcha", "normal"]]]
-            ] = [[] for _ in range(self.metagraph.n)]
-            min_len = min(len(self.tasks_history), len(all_tasks_history))
-            all_tasks_history[:min_len] = self.tasks_history[:min_len]
-            self.tasks_history = all_tasks_history
+            self.tasks_history = self.tasks_history.resize(self.metagraph.n)  # type: ignore
         # Update the hotkeys.
         self.hotkeys = copy.deepcopy(self.metagraph.hotkeys)
 
@@ -332,7 +351,7 @@ class BaseValidatorNeuron(BaseNeuron):
         self,
         is_correct_answers: List[bool],
         uids: List[int],
-        question_type: Literal["captcha", "normal"],
+        question_type: str,
     ):
         current_time = get_utc_timestamp()
         bt.logging.info(f"Updating scores called with rewards")
@@ -340,102 +359,103 @@ class BaseValidatorNeuron(BaseNeuron):
         bt.logging.debug(f"is_correct_answers: {is_correct_answers}")
         bt.logging.debug(f"question_type: {question_type}")
         bt.logging.debug(f"current_time: {current_time}")
-        bt.logging.debug(self.tasks_history)
         bt.logging.debug(self.scores)
-        for uid, is_answer_correct in zip(uids, is_correct_answers):
-            if uid not in self.tasks_history:
-                self.tasks_history[uid] = []
-            self.tasks_history[uid].append(
-                (is_answer_correct, current_time, question_type)
-            )
-
-        # Now that we have the rewards, we can update the scores.
-
-        for uid in uids:
-            recent_tasks = self.tasks_history[uid]
-            # remove old records
-            recent_tasks = [
-                (is_answer_correct, task_time, question_type)
-                for is_answer_correct, task_time, question_type in recent_tasks
-                if current_time - task_time < 86400
-            ]
-            # Separate regular questions and captchas
-            correct_answers = sum(
-                1
-                for is_answer_correct, task_time, question_type in recent_tasks
-                if is_answer_correct == True
-            )
-            correct_capthas = sum(
-                1
-                for is_answer_correct, task_time, question_type in recent_tasks
-                if is_answer_correct == True and question_type == "captcha"
-            )
+        self.score_answers(is_correct_answers, uids, current_time, question_type)
+        self.state_journal.record(
+            self.step,
+            current_time,
+            question_type,
+            uids,
+            [self.hotkeys[uid] for uid in uids],
+            is_correct_answers,
+        )
 
-            captcha_penalties = sum(
-                1
-                for is_answer_correct, task_time, question_type in recent_tasks
-                if question_type == "captcha" and is_answer_correct == False
-            )
-            wrong_answers = sum(
-                1
-                for is_answer_correct, task_time, question_type in recent_tasks
-                if is_answer_correct == False and question_type != "captcha"
-            )
-            score = linear_rewards(self, correct_answers)
-
-            penalize_score = True
-            # Currently we do not penalize the score if the miner has answered more than 2 hours in a day
-            # We know that the total number of questions in a day would roughly be 480
-            if correct_answers > 40:  # 2 hours of questions correct in last 24 hours
-                penalize_score = False
-
-            if penalize_score:
-                # For each wrong answer, penalize the score by 1% by computing the penalty
-                # as 1% of the total number of wrong answers
-                for i in range(wrong_answers):
-                    score = score * 0.99
-
-                # For each wrong captcha answer, penalize the score by 5% by computing the penalty
-                # as 5% of the total number of failed captchas
-                for i in range(captcha_penalties):
-                    score = score * 0.95
-
-            bt.logging.debug(
-                f"self.score: Updating score for miner {uid} with score {score}"
-            )
-            # Update the scores tensor
-            self.scores[uid] = torch.FloatTensor([score])
+    def score_answers(
+        self,
+        is_correct_answers: List[bool],
+        uids: List[int],
+        timestamp: int,
+        question_type: str,
+    ):
+        """Adds the answers to the tasks history and updates the scores of the miners."""
+        self.tasks_history.append(uids, is_correct_answers, timestamp, question_type)
 
-        # Remove old records to free up memory
-        for i in range(len(self.tasks_history)):
-            for t in self.tasks_history[i]:
-                if current_time - t[1] > 86400:
-                    self.tasks_history[i].remove(t)
+        # Now that we have the rewards, we can update the scores.
+        counts = self.tasks_history.window_counts(uids, timestamp)
+        scores = miner_scores(
+            torch.from_numpy(counts["correct_answers"]),
+            torch.from_numpy(counts["captcha_penalties"]),
+            torch.from_numpy(counts["wrong_answers"]),
+        )
+        bt.logging.debug(
+            f"self.score: Updating scores for miners {uids} with scores {scores.tolist()}"
+        )
+        # Update the scores tensor
+        self.scores[torch.as_tensor(uids, dtype=torch.long)] = scores.to(
+            self.scores.device
+        )
 
     def save_state(self):
-        """Saves the state of the validator to a file."""
+        """
+        Saves the state of the validator: appends the scoring events since the last
+        save to the state journal, and periodically a snapshot of the full state.
+        """
         bt.logging.info("Saving validator state.")
         bt.logging.debug(f"self.score: Saved step {self.step} in state.")
 
-        # Save the state of the validator to file.
-        torch.save(
+        self.state_journal.save(
             {
                 "step": self.step,
                 "scores": self.scores,
                 "hotkeys": self.hotkeys,
-                "tasks_history": self.tasks_history,
-            },
-            self.config.neuron.full_path + "/state.pt",
+                # As tensors, which torch.load accepts with weights_only.
+                "tasks_history": {
+                    name: torch.from_numpy(value)
+                    for name, value in self.tasks_history.state_dict().items()
+                },
+            }
         )
 
     def load_state(self):
-        """Loads the state of the validator from a file."""
+        """Loads the last snapshot of the validator state and replays the journal."""
         bt.logging.info("Loading validator state.")
 
-        # Load the state of the validator from file.
-        state = torch.load(self.config.neuron.full_path + "/state.pt")
-        self.step = state["step"]
-        bt.logging.debug(f"self.score: Loaded step {self.step} from state.")
-        self.scores = state["scores"]
-        self.hotkeys = state["hotkeys"]
-        self.tasks_history = state["tasks_history"]
+        state, events = self.state_journal.load()
+        if state is not None:
+            self.step = state["step"]
+            self.scores = state["scores"]
+            self.hotkeys = state["hotkeys"]
+            if isinstance(state["tasks_history"], list):
+                # States saved before the history was columnar.
+                self.tasks_history = TaskHistory.from_lists(
+                    state["tasks_history"], capacity=self.config.neuron.history_capacity  # type: ignore
+                )
+            else:
+                self.tasks_history = TaskHistory.from_state_dict(
+                    state["tasks_history"], capacity=self.config.neuron.history_capacity  # type: ignore
+                )
+        for event in events:
+            self.replay_event(event)
+        bt.logging.debug(
+            f"self.score: Loaded step {self.step} from state, replayed {len(events)} journal events."
+        )
+
+    def replay_event(self, event: dict):
+        """Applies a scoring event of the state journal."""
+        uids = event["uids"]
+        if uids and max(uids) >= len(self.scores):
+            # The metagraph grew after the snapshot.
+            n = max(uids) + 1
+            all_scores = torch.zeros(n).to(self.scores.device)
+            all_scores[: len(self.scores)] = self.scores
+            self.scores = all_scores
+            self.tasks_history = self.tasks_history.resize(n)
+            self.hotkeys = self.hotkeys + [""] * (n - len(self.hotkeys))
+        for uid, hotkey in zip(uids, event["hotkeys"]):
+            if self.hotkeys[uid] != hotkey:
+                # The hotkey was replaced after the snapshot.
+                self.scores[uid] = 0
+                self.tasks_history.reset(uid)
+                self.hotkeys[uid] = hotkey
+        self.score_answers(event["correct"], uids, event["timestamp"], event["type"])
+        self.step = max(self.step, event["step"])
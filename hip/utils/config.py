@@ -23,6 +23,14 @@ import bittensor as bt
 from loguru import logger
 
 
+def positive_int(value: str) -> int:
+    """Argument type of counts which must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def check_config(cls, config: "bt.Config"):  # type: ignore for config
     r"""Checks/validates the config namespace object."""
     bt.logging.check_config(config)
@@ -175,6 +183,217 @@ def add_validator_args(cls, parser):
         default=180,
     )
 
+    parser.add_argument(
+        "--neuron.task_pool_size",
+        type=positive_int,
+        help="Number of pre-generated tasks to keep ready per task type.",
+        default=4,
+    )
+
+    parser.add_argument(
+        "--neuron.task_pool_workers",
+        type=positive_int,
+        help="Number of background workers generating tasks per task type.",
+        default=1,
+    )
+
+    parser.add_argument(
+        "--neuron.render_workers",
+        type=int,
+        help="Number of worker processes rendering captcha and math images. 0 renders in the generating thread.",
+        default=2,
+    )
+
+    parser.add_argument(
+        "--neuron.reuse_llm_context",
+        action="store_true",
+        help="If set, each generated paragraph yields a qa, sentiment and summarization task served over subsequent steps.",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--neuron.min_sentiment_confidence",
+        type=float,
+        help="Sentiment tasks whose label the model is less confident about than this are discarded.",
+        default=0.6,
+    )
+
+    parser.add_argument(
+        "--neuron.encoding.image",
+        type=str,
+        help="Encoding of generated image task payloads as format[:level[:max_size]], format is one of png, png8, webp, jpeg.",
+        default="webp:80",
+    )
+
+    parser.add_argument(
+        "--neuron.encoding.captcha",
+        type=str,
+        help="Encoding of captcha task payloads as format[:level[:max_size]]. Lossless png by default, "
+        "a lossy format (e.g. webp:80) makes smaller payloads but blurs the characters.",
+        default="png",
+    )
+
+    parser.add_argument(
+        "--neuron.encoding.math",
+        type=str,
+        help="Encoding of math task payloads as format[:level[:max_size]].",
+        default="png8:16",
+    )
+
+    parser.add_argument(
+        "--neuron.task_bank_path",
+        type=str,
+        help="Path of a task bank (see generate-bank) to sample tasks from. Tasks are generated live if not set.",
+        default="",
+    )
+
+    parser.add_argument(
+        "--neuron.task_bank_min",
+        type=int,
+        help="Number of unserved tasks per task type below which the task bank is refilled in the background.",
+        default=100,
+    )
+
+    parser.add_argument(
+        "--neuron.task_bank_max_mb",
+        type=int,
+        help="Size in MB the task bank is not refilled beyond. 0 for no limit.",
+        default=2048,
+    )
+
+    parser.add_argument(
+        "--neuron.model_idle_timeout",
+        type=float,
+        help="Seconds a generator model can stay unused before it is unloaded. 0 keeps models loaded.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--neuron.dedupe_window",
+        type=int,
+        help="Number of recent tasks per task type that new tasks must not repeat. 0 disables the duplicate filter.",
+        default=2000,
+    )
+
+    parser.add_argument(
+        "--neuron.dedupe_error_rate",
+        type=float,
+        help="False positive rate of the duplicate filter for captcha, math and image tasks.",
+        default=0.001,
+    )
+
+    parser.add_argument(
+        "--neuron.dedupe_max_distance",
+        type=int,
+        help="Maximum SimHash distance in bits at which llm task paragraphs count as near-duplicates.",
+        default=3,
+    )
+
+    parser.add_argument(
+        "--neuron.task_schedule_window",
+        type=int,
+        help="Number of recently sent tasks over which the task type mix is kept at the target weights.",
+        default=100,
+    )
+
+    parser.add_argument(
+        "--neuron.generation_workers",
+        type=int,
+        help="Threads running the blocking work of forward, e.g. waiting for the task pool to refill, off the event loop.",
+        default=2,
+    )
+
+    parser.add_argument(
+        "--neuron.generator_workers",
+        type=int,
+        help="Number of separate generator worker processes. 0 generates tasks in the validator process.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--neuron.generator_socket_dir",
+        type=str,
+        help="Directory of the Unix sockets of the generator workers, empty for a generators directory "
+        "in the validator's directory. Only the validator's user can access it.",
+        default="",
+    )
+
+    parser.add_argument(
+        "--neuron.generator_gpus",
+        type=str,
+        help="Comma separated GPUs assigned to the generator workers in turn, e.g. 0,1. Empty shares all GPUs.",
+        default="",
+    )
+
+    parser.add_argument(
+        "--neuron.image_device",
+        type=str,
+        help="Device of the image generation pipeline. Falls back to cpu when the device is not available.",
+        default="cuda:1",
+    )
+
+    parser.add_argument(
+        "--neuron.image_dtype",
+        type=str,
+        choices=["float16", "bfloat16", "float32"],
+        help="Dtype of the image generation pipeline. float16 is run as float32 on cpu.",
+        default="float16",
+    )
+
+    parser.add_argument(
+        "--neuron.image_batch_size",
+        type=int,
+        help="Number of images generated per pipeline call.",
+        default=4,
+    )
+
+    parser.add_argument(
+        "--neuron.placement",
+        type=str,
+        help="Devices of the image and text models: auto to plan from the visible GPUs, or e.g. "
+        "'image=cuda:0,cuda:1;text=cuda:2+cuda:3' (one replica per device, + shards a replica). "
+        "Empty uses --neuron.image_device and spreads the text model over all GPUs.",
+        default="",
+    )
+
+    parser.add_argument(
+        "--neuron.text_backend",
+        type=str,
+        choices=["transformers", "llama_cpp"],
+        help="Text generation backend: transformers (fp16 on GPU) or llama_cpp (quantized GGUF model on CPU).",
+        default="transformers",
+    )
+
+    parser.add_argument(
+        "--neuron.text_model",
+        type=str,
+        help="Hugging Face model name for the transformers backend, or path of the GGUF file for llama_cpp.",
+        default="HuggingFaceH4/zephyr-7b-beta",
+    )
+
+    parser.add_argument(
+        "--neuron.text_threads",
+        type=int,
+        help="CPU threads used by the llama_cpp text backend. 0 uses all cores.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--neuron.history_capacity",
+        type=int,
+        help="Answers kept per miner for scoring. Raised to the number of tasks sent in 24 hours at "
+        "the task_gen_step and num_concurrent_forwards rate if smaller.",
+        default=1024,
+    )
+
+    parser.add_argument(
+        "--neuron.snapshot_interval",
+        type=positive_int,
+        help="State saves with new answers between full state snapshots, the others only append the new "
+        "answers to a journal.",
+        default=50,
+    )
+
     parser.add_argument(
         "--neuron.timeout",
         type=float,
@@ -0,0 +1,214 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+import torch
+from transformers import LogitsProcessor
+
+# Characters which are never generated inside a constrained JSON string, so strings
+# never need escaping and a `"` always closes the string.
+UNSAFE_STRING_CHARACTERS = set('"\\\n\r\t')
+
+
+class String:
+    """A JSON string value of at most `max_length` characters (without quotes)."""
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+
+
+class Choice:
+    """A single token value picked from a fixed set, e.g. the digits of an index."""
+
+    def __init__(self, values: List[str]):
+        self.values = values
+
+
+Segment = Union[str, String, Choice]
+
+# {"question": "...", "options": ["...", "...", "...", "..."], "answer": 0}
+QUESTION_ANSWER_TEMPLATE: List[Segment] = [
+    '{"question": "',
+    String(300),
+    '", "options": ["',
+    String(150),
+    '", "',
+    String(150),
+    '", "',
+    String(150),
+    '", "',
+    String(150),
+    '"], "answer": ',
+    Choice(["0", "1", "2", "3"]),
+    "}",
+]
+
+
+def max_template_tokens(template: List[Segment]) -> int:
+    """
+    Upper bound of the number of tokens needed to complete the template (every token
+    is at least one character), including the end of sequence token.
+    """
+    length = 1
+    for segment in template:
+        if isinstance(segment, str):
+            length += len(segment)
+        elif isinstance(segment, String):
+            length += segment.max_length
+        else:
+            length += 1
+    return length
+
+
+def template_to_gbnf(template: List[Segment]) -> str:
+    """
+    Converts the template into a GBNF grammar, for backends which constrain decoding
+    with a grammar (e.g. llama.cpp) instead of a logits processor.
+    """
+
+    def literal(text: str) -> str:
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    parts = []
+    for segment in template:
+        if isinstance(segment, str):
+            parts.append(literal(segment))
+        elif isinstance(segment, String):
+            parts.append(r'[^"\\\n\r\t]' + f"{{1,{segment.max_length}}}")
+        else:
+            parts.append(
+                "(" + " | ".join(literal(value) for value in segment.values) + ")"
+            )
+    return "root ::= " + " ".join(parts)
+
+
+class TokenTable:
+    """
+    The surface string of every token of a tokenizer, as it appears when the token
+    follows other text (i.e. including its leading space).
+    """
+
+    def __init__(self, tokenizer):
+        anchor = tokenizer.encode("a", add_special_tokens=False)[-1]
+        prefix = tokenizer.decode([anchor])
+        decoded = tokenizer.batch_decode(
+            [[anchor, token_id] for token_id in range(len(tokenizer))]
+        )
+        special_ids = set(tokenizer.all_special_ids)
+        self.strings: List[str] = [
+            "" if token_id in special_ids else text[len(prefix) :]
+            for token_id, text in enumerate(decoded)
+        ]
+        self.eos_token_id: int = tokenizer.eos_token_id
+        self.safe = torch.tensor(
+            [bool(s) and not (set(s) & UNSAFE_STRING_CHARACTERS) for s in self.strings]
+        )
+        # Tokens containing a quote are the only ones that can close a string.
+        self.quoted: List[int] = [i for i, s in enumerate(self.strings) if '"' in s]
+        self.by_first_character: Dict[str, List[int]] = {}
+        for token_id, s in enumerate(self.strings):
+            if s:
+                self.by_first_character.setdefault(s[0], []).append(token_id)
+
+
+@lru_cache(maxsize=4)
+def get_token_table(tokenizer) -> TokenTable:
+    return TokenTable(tokenizer)
+
+
+def template_state(template: List[Segment], text: str) -> Tuple[int, str]:
+    """
+    Matches the generated text against the template.
+
+    Returns:
+        Tuple[int, str]: The index of the segment being generated (len(template) when
+        the template is complete), and the remaining literal if that segment is a
+        literal or the partial value generated so far otherwise.
+    """
+    position = 0
+    for index, segment in enumerate(template):
+        rest = text[position:]
+        if isinstance(segment, str):
+            if len(rest) < len(segment):
+                return index, segment[len(rest) :]
+            position += len(segment)
+        elif isinstance(segment, String):
+            end = rest.find('"')
+            if end == -1:
+                return index, rest
+            position += end
+        else:
+            if not rest:
+                return index, rest
+            position += 1
+    return len(template), ""
+
+
+class TemplateLogitsProcessor(LogitsProcessor):
+    """
+    Restricts generation to text matching a JSON template, and forces the end of
+    sequence token as soon as the template is complete.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        template: List[Segment],
+        prompt_length: Optional[int] = None,
+    ):
+        """
+        Args:
+            tokenizer: The tokenizer of the model.
+            template (List[Segment]): The template the generated text must match.
+            prompt_length (Optional[int]): Length of the (padded) prompt, taken from
+                the first call if not given.
+        """
+        self.table = get_token_table(tokenizer)
+        self.template = template
+        self.prompt_length = prompt_length
+
+    def allowed_tokens(self, text: str, vocab_size: int) -> torch.Tensor:
+        allowed = torch.zeros(vocab_size, dtype=torch.bool)
+        index, state = template_state(self.template, text)
+        if index == len(self.template):
+            allowed[self.table.eos_token_id] = True
+            return allowed
+
+        segment = self.template[index]
+        strings = self.table.strings
+        if isinstance(segment, str):
+            for token_id in self.table.by_first_character.get(state[0], []):
+                if state.startswith(strings[token_id]):
+                    allowed[token_id] = True
+        elif isinstance(segment, String):
+            if len(state) < segment.max_length:
+                size = min(vocab_size, len(self.table.safe))
+                allowed[:size] = self.table.safe[:size]
+            if state:
+                # Tokens closing the string, which must continue into the next literal.
+                closing = str(self.template[index + 1])
+                for token_id in self.table.quoted:
+                    s = strings[token_id]
+                    quote = s.index('"')
+                    is_safe = not set(s[:quote]) & UNSAFE_STRING_CHARACTERS
+                    fits = len(state) + quote <= segment.max_length
+                    if is_safe and fits and closing.startswith(s[quote:]):
+                        allowed[token_id] = True
+        else:
+            for value in segment.values:
+                for token_id in self.table.by_first_character.get(value[0], []):
+                    if strings[token_id] == value:
+                        allowed[token_id] = True
+        return allowed
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        if self.prompt_length is None:
+            # The first call happens before any token was generated.
+            self.prompt_length = input_ids.shape[1]
+        for row in range(input_ids.shape[0]):
+            generated = input_ids[row, self.prompt_length :].tolist()
+            text = "".join(self.table.strings[token_id] for token_id in generated)
+            allowed = self.allowed_tokens(text, scores.shape[-1]).to(scores.device)
+            scores[row] = scores[row].masked_fill(~allowed, -float("inf"))
+        return scores
@@ -0,0 +1,241 @@
+import hashlib
+import math
+import re
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import bittensor as bt
+import numpy as np
+
+from hip.protocol import TaskSynapse
+from hip.validator.generators.llm_generator import (
+    SENTIMENT_TASK_LABEL,
+    SUMMARIZATION_TASK_LABEL,
+)
+
+# Recent tasks remembered per task type. There are only 300 distinct math equations
+# and about 200 image subjects, so these types only avoid repeating the recent ones.
+DEFAULT_WINDOWS = {"math": 100, "image": 50}
+
+WORD = re.compile(r"\w+")
+
+
+def hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """
+    A set membership filter using a fixed number of bits. Lookups can return false
+    positives at the configured rate, but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Args:
+            capacity (int): Number of keys the error rate holds for.
+            error_rate (float): The false positive rate at capacity.
+        """
+        capacity = max(1, capacity)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, key: str) -> np.ndarray:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return np.array(
+            [(h1 + i * h2) % self.size for i in range(self.hashes)], dtype=np.int64
+        )
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        np.bitwise_or.at(
+            self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8)
+        )
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        return bool(np.all(self.bits[positions >> 3] & (1 << (positions & 7))))
+
+
+class RotatingBloomFilter:
+    """
+    Remembers the most recent keys (between `capacity / 2` and `capacity` of them) in
+    bounded memory, by switching between two Bloom filters of half the capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.generation_size = max(1, capacity // 2)
+        self.error_rate = error_rate
+        self.current = BloomFilter(self.generation_size, error_rate)
+        self.previous: Optional[BloomFilter] = None
+        self.count = 0
+
+    def add(self, key: str):
+        if self.count >= self.generation_size:
+            self.previous = self.current
+            self.current = BloomFilter(self.generation_size, self.error_rate)
+            self.count = 0
+        self.current.add(key)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or (
+            self.previous is not None and key in self.previous
+        )
+
+
+def simhash(text: str) -> int:
+    """
+    Returns the 64 bit SimHash of the word 3-grams of the text. Similar texts have
+    fingerprints differing in few bits.
+    """
+    words = WORD.findall(text.lower())
+    shingles = [" ".join(words[i : i + 3]) for i in range(max(1, len(words) - 2))]
+    hashes = np.array([hash64(s.encode("utf-8")) for s in shingles], dtype=np.uint64)
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.sum(majority.astype(np.uint64) << np.arange(64, dtype=np.uint64)))
+
+
+class SimHashIndex:
+    """
+    The SimHash fingerprints of the most recent texts, with constant time lookup of a
+    fingerprint within `max_distance` bits. The fingerprint is split into
+    `max_distance + 1` bands: two fingerprints that close agree on at least one band.
+    """
+
+    def __init__(self, capacity: int, max_distance: int):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = 64 // bands
+        self.bands: List[Tuple[int, int]] = [
+            (i * width, width if i < bands - 1 else 64 - i * width)
+            for i in range(bands)
+        ]
+        self.fingerprints: Deque[int] = deque()
+        self.capacity = capacity
+        self.buckets: Dict[Tuple[int, int], List[int]] = {}
+
+    def _keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (band, (fingerprint >> shift) & ((1 << width) - 1))
+            for band, (shift, width) in enumerate(self.bands)
+        ]
+
+    def add(self, fingerprint: int):
+        if len(self.fingerprints) >= self.capacity:
+            oldest = self.fingerprints.popleft()
+            for key in self._keys(oldest):
+                self.buckets[key].remove(oldest)
+                if not self.buckets[key]:
+                    del self.buckets[key]
+        self.fingerprints.append(fingerprint)
+        for key in self._keys(fingerprint):
+            self.buckets.setdefault(key, []).append(fingerprint)
+
+    def __contains__(self, fingerprint: int) -> bool:
+        return any(
+            bin(fingerprint ^ candidate).count("1") <= self.max_distance
+            for key in self._keys(fingerprint)
+            for candidate in self.buckets.get(key, [])
+        )
+
+
+class TaskDeduplicator:
+    """
+    Rejects tasks that repeat a recent task of the same type: near-duplicate
+    paragraphs for llm tasks (SimHash), and exact repeats of the captcha text, the math
+    equation or the image prompt (Bloom filter).
+    """
+
+    def __init__(
+        self,
+        window: int = 2000,
+        error_rate: float = 0.001,
+        max_distance: int = 3,
+        attempts: int = 5,
+    ):
+        """
+        Args:
+            window (int): Number of recent tasks remembered per task type.
+            error_rate (float): False positive rate of the Bloom filters.
+            max_distance (int): Maximum SimHash distance, in bits, of near-duplicate texts.
+            attempts (int): Generations tried before giving up on a unique task.
+        """
+        self.window = window
+        self.error_rate = error_rate
+        self.max_distance = max_distance
+        self.attempts = attempts
+        self.filters: Dict[str, RotatingBloomFilter] = {}
+        self.indexes: Dict[str, SimHashIndex] = {}
+        self.lock = threading.Lock()
+
+    def _window(self, task_type: str) -> int:
+        return min(self.window, DEFAULT_WINDOWS.get(task_type, self.window))
+
+    def _key(self, task: TaskSynapse, task_type: str) -> str:
+        if task_type == "math":
+            # Equations are rendered deterministically, the image identifies the equation.
+            return hashlib.blake2b(task.image.encode("utf-8")).hexdigest()
+        if task_type == "image":
+            # The answer is the prompt of the image, the options are random distractors.
+            return task.answer.strip().lower()
+        return task.answer
+
+    def _text_namespace(self, task: TaskSynapse) -> str:
+        # Tasks of a context bundle share their paragraph, only compare within a kind.
+        if task.label in (SENTIMENT_TASK_LABEL, SUMMARIZATION_TASK_LABEL):
+            return task.label
+        return "qa"
+
+    def check(self, task: TaskSynapse, task_type: str) -> bool:
+        """
+        Returns whether the task is new, and if so remembers it.
+        """
+        with self.lock:
+            if task_type == "llm":
+                namespace = self._text_namespace(task)
+                index = self.indexes.get(namespace)
+                if index is None:
+                    index = SimHashIndex(self._window(task_type), self.max_distance)
+                    self.indexes[namespace] = index
+                fingerprint = simhash(task.value)
+                if fingerprint in index:
+                    return False
+                index.add(fingerprint)
+                return True
+
+            bloom = self.filters.get(task_type)
+            if bloom is None:
+                bloom = RotatingBloomFilter(self._window(task_type), self.error_rate)
+                self.filters[task_type] = bloom
+            key = self._key(task, task_type)
+            if key in bloom:
+                return False
+            bloom.add(key)
+            return True
+
+    def filter(
+        self, task_type: str, generator: Callable[[], TaskSynapse]
+    ) -> Callable[[], TaskSynapse]:
+        """
+        Wraps a task generator so it only returns tasks which are not duplicates.
+        """
+
+        def generate() -> TaskSynapse:
+            for _ in range(self.attempts):
+                task = generator()
+                if self.check(task, task_type):
+                    return task
+                bt.logging.debug(f"Rejected duplicate {task_type} task {task.id}")
+            raise ValueError(
+                f"No unique {task_type} task after {self.attempts} attempts"
+            )
+
+        return generate
@@ -0,0 +1,92 @@
+import base64
+from io import BytesIO
+from typing import Dict, Tuple
+
+from PIL import Image
+
+MIME_TYPES = {
+    "png": "image/png",
+    "png8": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+# Default level of each format: compression level for png, palette size for png8 and quality for the lossy formats.
+DEFAULT_LEVELS = {"png": 6, "png8": 256, "webp": 80, "jpeg": 80}
+
+# The encoding used for the images of each task type, see `parse_encoding` for the format.
+ENCODINGS: Dict[str, str] = {
+    "image": "webp:80",
+    # Lossless, lossy artifacts make captcha characters harder to read.
+    "captcha": "png",
+    "math": "png8:16",
+}
+
+
+def parse_encoding(encoding: str) -> Tuple[str, int, int]:
+    """
+    Parses an encoding of the form `format[:level[:max_size]]`, e.g. `webp:80:512`.
+
+    Args:
+        encoding (str): The encoding. The format is one of png, png8, webp or jpeg. The level is the
+            compression level (0-9) for png, the palette size for png8 and the quality (1-100) for
+            webp and jpeg. Images larger than max_size pixels on their longest side are downscaled.
+
+    Returns:
+        Tuple[str, int, int]: The format, level and max size (0 for no downscaling).
+    """
+    parts = encoding.lower().split(":")
+    image_format = parts[0]
+    if image_format not in MIME_TYPES:
+        raise ValueError(f"Unknown image encoding format: {image_format}")
+    level = (
+        int(parts[1]) if len(parts) > 1 and parts[1] else DEFAULT_LEVELS[image_format]
+    )
+    max_size = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+    return image_format, level, max_size
+
+
+def encode_image(image: Image.Image, encoding: str) -> Tuple[bytes, str]:
+    """
+    Encodes an image with the given encoding.
+
+    Returns:
+        Tuple[bytes, str]: The encoded image and its mime type.
+    """
+    image_format, level, max_size = parse_encoding(encoding)
+    if max_size and max(image.size) > max_size:
+        image = image.copy()
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    buffer = BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", compress_level=level)
+    elif image_format == "png8":
+        image.convert("RGB").quantize(colors=level).save(
+            buffer, format="PNG", optimize=True
+        )
+    elif image_format == "webp":
+        image.save(buffer, format="WEBP", quality=level, method=4)
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=level, optimize=True)
+    return buffer.getvalue(), MIME_TYPES[image_format]
+
+
+def to_data_uri(data: bytes, mime_type: str) -> str:
+    """
+    Returns the encoded image as a base64 data uri, the format sent to the miners.
+    """
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def configure_encodings(**encodings: str):
+    """
+    Sets the encoding of each task type, e.g. `configure_encodings(image="jpeg:75:512")`.
+    """
+    for task_type, encoding in encodings.items():
+        parse_encoding(encoding)  # fail early on invalid encodings
+        ENCODINGS[task_type] = encoding
+
+
+def get_encoding(task_type: str) -> str:
+    return ENCODINGS.get(task_type, "png")
@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import bittensor as bt
+
+# The executor running blocking work awaited from forward, e.g. waiting for the task
+# pool. Image based renderers run in the render pool (see hip.validator.render_pool).
+generation_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure_generation_executor(workers: int):
+    """
+    Starts the thread pool running blocking generation work for the event loop.
+
+    Args:
+        workers (int): Number of generation threads.
+    """
+    global generation_executor
+    if generation_executor is not None:
+        generation_executor.shutdown(wait=False)
+    generation_executor = ThreadPoolExecutor(
+        max_workers=max(1, workers), thread_name_prefix="generation"
+    )
+
+
+async def run_blocking(function: Callable, *args, **kwargs):
+    """
+    Runs a blocking function on the generation executor and waits for its result
+    without blocking the event loop, so concurrent forwards keep making progress.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        generation_executor, functools.partial(function, *args, **kwargs)
+    )
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping coroutine, i.e. how long the
+    loop is blocked by synchronous work.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stopped = asyncio.Event()
+
+    async def run(self):
+        while not self.stopped.is_set():
+            start_time = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start_time - self.interval)
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def stop(self):
+        self.stopped.set()
+
+    @property
+    def mean_lag(self) -> float:
+        return self.total_lag / self.samples if self.samples else 0.0
+
+    def log(self):
+        bt.logging.debug(
+            f"Event loop lag: mean {self.mean_lag * 1000:.1f}ms, max {self.max_lag * 1000:.1f}ms over {self.samples} samples"
+        )
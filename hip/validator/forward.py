@@ -17,43 +17,35 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import random
 import bittensor as bt
-from typing import Tuple
 from tabulate import tabulate
 
 from hip.protocol import TaskSynapse
 from hip.utils.misc import get_utc_timestamp
+from hip.validator.event_loop import run_blocking
 from hip.validator.generators.image_generator import generate_image_task
 from hip.validator.generators.math_generator import generate_math_task
+from hip.validator.models import registry
+from hip.validator.placement import placement
 from hip.validator.reward import get_rewards
 from hip.utils.uids import get_random_uids
 from hip.validator.generators.llm_generator import generate_llm_task
 from hip.validator.generators.captcha_generator import generate_captcha_task
 import time
 
+TASK_GENERATORS = {
+    "image": generate_image_task,
+    "llm": generate_llm_task,
+    "captcha": generate_captcha_task,
+    "math": generate_math_task,
+}
+TASK_WEIGHTS = {"image": 0.3, "llm": 0.3, "captcha": 0.1, "math": 0.3}
 
-def generate_task() -> Tuple[TaskSynapse, str]:
-    """
-    Generate a random task to be sent to the miners.
 
-    Returns:
-        TaskSynapse: A randomly generated task.
+def log_task(task: TaskSynapse, task_type: str):
+    """
+    Log a generated task for monitoring purposes.
     """
-    task_type = random.choices(
-        ["image", "llm", "captcha", "math"], weights=[0.3, 0.3, 0.1, 0.3], k=1
-    )[0]
-    task = None
-    if task_type == "image":
-        task = generate_image_task()
-    elif task_type == "llm":
-        task = generate_llm_task()
-    elif task_type == "captcha":
-        task = generate_captcha_task()
-    else:
-        task = generate_math_task()
-
-    # Log the generated task for monitoring purposes.
     bt.logging.debug(f"Task: {task.id} - Generated task type: {task_type}")
     task_to_print = task.to_dict()
     # replace image entry with true or false
@@ -64,8 +56,6 @@ def generate_task() -> Tuple[TaskSynapse, str]:
         f"Task: {task.id} - Generated task: {task_to_print}",
     )
 
-    return task, task_type
-
 
 async def forward(self):
     """
@@ -93,17 +83,40 @@ async def forward(self):
     bt.logging.debug("Forwarding task to miners")
     miner_uids = get_random_uids(self, k=self.config.neuron.sample_size)
 
-    # Generate a task to be sent to the miners.
-    task = None
-    task_type = None
-    try:
-        task, task_type = generate_task()
-    except Exception as e:
-        bt.logging.error(f"Error generating image_task: {e} \n Retrying...")
-        self._last_run_time = get_utc_timestamp() - (
-            task_gen_step + 1
-        )  # Retry immediately
-        return
+    # Free generator models that have not been used for a while.
+    if self.config.neuron.model_idle_timeout > 0:
+        await run_blocking(registry.unload_idle, self.config.neuron.model_idle_timeout)
+
+    # Pop a pre-generated task of a type that keeps the target mix and can be served within the step.
+    task_type = self.task_scheduler.choose(self.task_pool.sizes(), task_gen_step)
+    task, task_type = self.task_pool.pop(task_type)
+    if task is None:
+        bt.logging.warning(
+            f"Task pool is empty {self.task_pool.sizes()}, waiting for a task"
+        )
+        # Wait for the pool workers rather than calling the generator here, which would
+        # use the same model concurrently. Take the first task of any type, e.g. a math
+        # task while the image model is still loading. Wait off the event loop, so the
+        # other forwards keep running meanwhile.
+        task, task_type = await run_blocking(
+            self.task_pool.pop, task_type, float(task_gen_step)
+        )
+        if task is None:
+            bt.logging.warning("No task was generated \n Retrying...")
+            self._last_run_time = get_utc_timestamp() - (
+                task_gen_step + 1
+            )  # Retry immediately
+            return
+    self.task_scheduler.record_served(task_type)
+    bt.logging.debug(f"Task scheduler: {self.task_scheduler.stats()}")
+    # Report the device utilization from where the models live, every few minutes.
+    if time.monotonic() - getattr(self, "_last_utilization_report", 0) > 300:
+        self._last_utilization_report = time.monotonic()
+        if self.config.neuron.generator_workers > 0:
+            bt.logging.debug(f"Generator workers: {self.generator_client.health}")
+        else:
+            bt.logging.debug(f"Device utilization: {placement.utilization()}")
+    log_task(task, task_type)
 
     ground_truth = task.answer
     task.answer = ""
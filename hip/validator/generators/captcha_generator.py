@@ -1,24 +1,33 @@
 import uuid
-from captcha.image import ImageCaptcha
 import random
-from io import BytesIO
-import base64
+from typing import Tuple
 
 from hip.protocol import TaskSynapse
+from hip.validator.encoding import encode_image, get_encoding, to_data_uri
+from hip.validator.generators.render_cache import get_image_captcha
+from hip.validator.render_pool import render
 
 
 def generate_random_string(length=5):
     return "".join(random.choices("12346789ABCDEFGHIJKLMNPQRTUVWXYZ", k=length))
 
 
+def render_captcha(captcha_text: str, encoding: str = "png") -> Tuple[bytes, str]:
+    """
+    Renders the captcha text into an encoded image.
+
+    Returns:
+        Tuple[bytes, str]: The encoded image and its mime type.
+    """
+    image = get_image_captcha().generate_image(captcha_text)
+    return encode_image(image, encoding)
+
+
 def generate_captcha() -> dict[str, str]:
-    image = ImageCaptcha()
     captcha_text = generate_random_string()
-    data: BytesIO = image.generate(captcha_text)
-    image_base64 = base64.b64encode(data.getvalue()).decode("utf-8")
-    mime_type = "data:image/png;base64,"
+    data, mime_type = render(render_captcha, captcha_text, get_encoding("captcha"))
     return {
-        "image": mime_type + image_base64,
+        "image": to_data_uri(data, mime_type),
         "text": captcha_text,
     }
 
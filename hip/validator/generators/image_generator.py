@@ -1,24 +1,87 @@
+from collections import deque
+from typing import Deque, List, Tuple
 import random
+import threading
+import time
 import uuid
-from diffusers.pipelines.auto_pipeline import AutoPipelineForText2Image
+import bittensor as bt
 import torch
 from hip.protocol import TaskSynapse
-from hip.validator import text_generator
-from io import BytesIO
-import base64
+from hip.validator.encoding import encode_image, get_encoding, to_data_uri
+from hip.validator.placement import placement
 
 from hip.validator.words import get_random_animals, get_random_objects
 
-pipeline = AutoPipelineForText2Image.from_pretrained(
-    "stabilityai/sdxl-turbo", torch_dtype=torch.float16, variant="fp16"
-).to("cuda:1")
+# Where and how the SDXL pipeline runs, see `configure_image_generator`.
+image_device = "cuda:1"
+image_dtype = "float16"
+image_batch_size = 1
+# Tasks generated by a batch and not served yet.
+prepared_tasks: Deque[TaskSynapse] = deque()
+prepared_tasks_lock = threading.Lock()
 
+DTYPES = {
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+    "float32": torch.float32,
+}
 
-def generate_image_task() -> TaskSynapse:
+
+def configure_image_generator(device: str, dtype: str = "float16", batch_size: int = 1):
+    """
+    Configures the image task generation. Takes effect the next time the pipeline is loaded.
+
+    Args:
+        device (str): The torch device to run the pipeline on, e.g. `cuda:1` or `cpu`.
+            See hip.validator.placement to run replicas on several devices.
+        dtype (str): The pipeline dtype, one of float16, bfloat16 or float32.
+        batch_size (int): Number of images generated per pipeline call.
+    """
+    global image_device, image_dtype, image_batch_size
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown image dtype: {dtype}")
+    image_device = device
+    image_dtype = dtype
+    image_batch_size = max(1, batch_size)
+    placement.place("image", [device])
+
+
+def resolve_device(device: str) -> str:
+    """
+    Returns the device if it is available, otherwise falls back to the cpu.
+    """
+    if device.startswith("cuda"):
+        index = int(device.split(":")[1]) if ":" in device else 0
+        if not torch.cuda.is_available() or index >= torch.cuda.device_count():
+            bt.logging.warning(f"{device} is not available, generating images on cpu")
+            return "cpu"
+    return device
+
+
+def load_image_pipeline(device: str):
+    from diffusers.pipelines.auto_pipeline import AutoPipelineForText2Image
+
+    # The pipeline fits on one GPU, it is not sharded.
+    device = resolve_device(device.split("+")[0])
+    dtype = DTYPES[image_dtype]
+    if device == "cpu" and dtype == torch.float16:
+        # Half precision is not supported by most cpu kernels.
+        dtype = torch.float32
+    return AutoPipelineForText2Image.from_pretrained(
+        "stabilityai/sdxl-turbo", torch_dtype=dtype, variant="fp16"
+    ).to(device)
+
+
+placement.register("image", load_image_pipeline, [image_device])
+
+
+def random_image_question() -> Tuple[str, List[str], str]:
     """
-    Generates an image based on the prompt
-    @param prompt: The prompt to generate the image
-    @return: The base64 encoded image
+    Picks the subject of an image task.
+
+    Returns:
+        Tuple[str, List[str], str]: The question, the options and the answer, which is
+        also the prompt of the image.
     """
     type_to_prompt = random.choice(["animal", "object"])
     choices = []
@@ -30,22 +93,53 @@ def generate_image_task() -> TaskSynapse:
         choices = get_random_objects()
         label = label.replace("[replace]", "object")
     answer = f"{random.choice(choices)}"
-    image = pipeline(prompt=answer, guidance_scale=0.0, num_inference_steps=1).images[0]
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    # Append the data type
-    image_base64 = f"data:image/png;base64,{image_base64}"
-    return TaskSynapse(
-        id=str(uuid.uuid4()),
-        label=label,
-        type="select",
-        options=choices,
-        value="",
-        image=image_base64,
-        answer=answer,
+    return label, choices, answer
+
+
+def generate_image_tasks(count: int) -> List[TaskSynapse]:
+    """
+    Generates `count` image tasks with a single pipeline call.
+    """
+    questions = [random_image_question() for _ in range(count)]
+    start_time = time.perf_counter()
+    with placement.acquire("image") as pipeline:
+        images = pipeline(
+            prompt=[answer for _, _, answer in questions],
+            guidance_scale=0.0,
+            num_inference_steps=1,
+        ).images
+    bt.logging.debug(
+        f"Generated {count} images in {time.perf_counter() - start_time:.2f}s"
     )
+    tasks = []
+    for (label, choices, answer), image in zip(questions, images):
+        data, mime_type = encode_image(image, get_encoding("image"))
+        tasks.append(
+            TaskSynapse(
+                id=str(uuid.uuid4()),
+                label=label,
+                type="select",
+                options=choices,
+                value="",
+                image=to_data_uri(data, mime_type),
+                answer=answer,
+            )
+        )
+    return tasks
+
+
+def generate_image_task() -> TaskSynapse:
+    """
+    Generates an image task. Images are generated `image_batch_size` at a time, the
+    rest of the batch is served by the following calls.
+    """
+    with prepared_tasks_lock:
+        if prepared_tasks:
+            return prepared_tasks.popleft()
+    tasks = generate_image_tasks(image_batch_size)
+    with prepared_tasks_lock:
+        prepared_tasks.extend(tasks[1:])
+    return tasks[0]
 
 
 if __name__ == "__main__":
@@ -1,15 +1,43 @@
+from collections import deque
 from hip.protocol import TaskSynapse
 from hip.validator import text_generator
+from typing import Deque, List, Optional
 import random
+import threading
 import uuid
 import bittensor as bt
 
+LLM_TASK_TYPES = ["qa", "sentiment_analysis", "summarization"]
+SENTIMENT_TASK_LABEL = "What is the sentiment of the given text?"
+SUMMARIZATION_TASK_LABEL = "Select the correct summary for the given text:"
 
-def generate_llm_task() -> TaskSynapse:
-    bt.logging.info("Generating a new task")
-    context = text_generator.generate_paragraph()
-    bt.logging.info(f"Context: {context}")
-    taskType = random.choice(["qa", "sentiment_analysis", "summarization"])
+# When enabled, every generated paragraph is used for all llm task types and the
+# resulting tasks are served one by one over subsequent calls.
+reuse_context = False
+# Sentiment tasks are dropped when the model's confidence in the label is lower than this.
+min_sentiment_confidence = 0.0
+bundled_tasks: Deque[TaskSynapse] = deque()
+bundled_tasks_lock = threading.Lock()
+
+
+def configure_llm_generator(reuse: bool, sentiment_confidence: float = 0.0):
+    """
+    Configures the llm task generation.
+
+    Args:
+        reuse (bool): Whether to derive all llm task types from one generated paragraph.
+        sentiment_confidence (float): Minimum label confidence for sentiment tasks.
+    """
+    global reuse_context, min_sentiment_confidence
+    reuse_context = reuse
+    min_sentiment_confidence = sentiment_confidence
+
+
+def build_llm_task(context: str, taskType: str) -> Optional[TaskSynapse]:
+    """
+    Derives a task of the given type from the context. Returns None when the task
+    is skipped, i.e. a sentiment label below the minimum confidence.
+    """
     bt.logging.info(f"Task Type: {taskType}")
     if taskType == "qa":
         task = text_generator.generate_question_answer(context)
@@ -29,11 +57,16 @@ def generate_llm_task() -> TaskSynapse:
             answer=task["options"][task["answer"]],
         )
     elif taskType == "sentiment_analysis":
-        sentiment = text_generator.get_sentiment(context)
-        bt.logging.info(f"Task: {sentiment}")
+        sentiment, confidence = text_generator.classify_sentiment(context)
+        bt.logging.info(f"Task: {sentiment} (confidence {confidence:.2f})")
+        if confidence < min_sentiment_confidence:
+            bt.logging.debug(
+                f"Skipping sentiment task: confidence {confidence:.2f} is below {min_sentiment_confidence}"
+            )
+            return None
         return TaskSynapse(
             id=str(uuid.uuid4()),
-            label="What is the sentiment of the given text?",
+            label=SENTIMENT_TASK_LABEL,
             type="select",
             options=["Positive", "Negative", "Neutral"],
             value=context,
@@ -52,7 +85,7 @@ def generate_llm_task() -> TaskSynapse:
 
         return TaskSynapse(
             id=str(uuid.uuid4()),
-            label="Select the correct summary for the given text:",
+            label=SUMMARIZATION_TASK_LABEL,
             type="select",
             options=shuffledSummaries,
             value=context,
@@ -62,3 +95,47 @@ def generate_llm_task() -> TaskSynapse:
     else:
         # throw an error
         raise ValueError("Invalid task type")
+
+
+def generate_llm_task_bundle() -> List[TaskSynapse]:
+    """
+    Generates one paragraph and derives a task of every llm task type from it.
+    Task types whose generation fails or is skipped are left out of the bundle.
+    """
+    bt.logging.info("Generating a new task bundle")
+    context = text_generator.generate_paragraph()
+    bt.logging.info(f"Context: {context}")
+    tasks = []
+    for taskType in random.sample(LLM_TASK_TYPES, len(LLM_TASK_TYPES)):
+        try:
+            task = build_llm_task(context, taskType)
+        except Exception as e:
+            bt.logging.warning(f"Error generating {taskType} task from context: {e}")
+            continue
+        if task is not None:
+            tasks.append(task)
+    if not tasks:
+        raise ValueError("No task could be generated from the context")
+    return tasks
+
+
+def generate_llm_task() -> TaskSynapse:
+    if reuse_context:
+        with bundled_tasks_lock:
+            if bundled_tasks:
+                return bundled_tasks.popleft()
+        tasks = generate_llm_task_bundle()
+        with bundled_tasks_lock:
+            bundled_tasks.extend(tasks[1:])
+        return tasks[0]
+
+    bt.logging.info("Generating a new task")
+    context = text_generator.generate_paragraph()
+    bt.logging.info(f"Context: {context}")
+    taskType = random.choice(LLM_TASK_TYPES)
+    task = build_llm_task(context, taskType)
+    if task is None:
+        # Derive another task type from the paragraph instead of wasting it.
+        taskType = random.choice([t for t in LLM_TASK_TYPES if t != taskType])
+        task = build_llm_task(context, taskType)
+    return task
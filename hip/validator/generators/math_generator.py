@@ -1,9 +1,23 @@
 import random
 import uuid
-from PIL import Image, ImageDraw, ImageFont
+from typing import Tuple
 from hip.protocol import TaskSynapse
-from io import BytesIO
-import base64
+from hip.validator.encoding import encode_image, get_encoding, to_data_uri
+from hip.validator.generators.render_cache import get_canvas, get_glyph_atlas
+from hip.validator.render_pool import render
+
+
+def render_math(math_task: str, encoding: str = "png") -> Tuple[bytes, str]:
+    """
+    Renders the math equation into an encoded image.
+    @param math_task: The equation to render
+    @param encoding: The image encoding, see hip.validator.encoding
+    @return: The encoded image and its mime type
+    """
+    # Compose the equation from the cached, pre-rasterized glyphs
+    image = get_canvas(200, 100).copy()
+    get_glyph_atlas(32).draw(image, math_task)
+    return encode_image(image, encoding)
 
 
 def generate_math_task() -> TaskSynapse:
@@ -11,10 +25,6 @@ def generate_math_task() -> TaskSynapse:
     Generates an image containing a math equation and the answer
     @return: The base64 encoded image in a TaskSynapse object
     """
-    width, height = 200, 100
-    image = Image.new("RGB", (width, height), "white")
-    draw = ImageDraw.Draw(image)
-
     # Generate a basic math task (e.g., addition, subtraction)
     num1 = random.randint(0, 9)
     num2 = random.randint(0, 9)
@@ -31,24 +41,8 @@ def generate_math_task() -> TaskSynapse:
 
     math_task = f"{num1} {operation} {num2} = ?"
 
-    # Define the font and size
-    font = ImageFont.load_default()
-    try:
-        font = ImageFont.truetype("arial.ttf", 32)
-    except IOError:
-        font = ImageFont.load_default(size=32)
-    bbox = draw.textbbox((0, 0), math_task, font=font)
-    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    text_x = (width - text_width) // 2
-    text_y = (height - text_height) // 2
-    draw.text((text_x, text_y), math_task, fill="black", font=font)
-
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    buffer.seek(0)
-    image_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    # Append the data type
-    image_base64 = f"data:image/png;base64,{image_base64}"
+    data, mime_type = render(render_math, math_task, get_encoding("math"))
+    image_base64 = to_data_uri(data, mime_type)
     return TaskSynapse(
         id=str(uuid.uuid4()),
         label="Solve the math task",
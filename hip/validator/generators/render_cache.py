@@ -0,0 +1,89 @@
+import math
+import threading
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from captcha.image import ImageCaptcha
+from PIL import Image, ImageDraw, ImageFont
+
+# Characters needed to render the math tasks.
+MATH_CHARACTERS = "0123456789+-*=? "
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int) -> ImageFont.FreeTypeFont:
+    """
+    Returns the font used to render tasks, resolving it only once per size.
+    """
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except IOError:
+        return ImageFont.load_default(size=size)  # type: ignore
+
+
+# The captcha generators of each thread, see `get_image_captcha`.
+_thread_captchas = threading.local()
+
+
+def get_image_captcha(width: int = 160, height: int = 60) -> ImageCaptcha:
+    """
+    Returns a captcha generator of the calling thread. ImageCaptcha loads its fonts on
+    first use, so it is reused instead of being created for every captcha, but it is
+    not thread safe, so the TaskPool threads each have their own.
+    """
+    captchas = getattr(_thread_captchas, "captchas", None)
+    if captchas is None:
+        captchas = _thread_captchas.captchas = {}
+    if (width, height) not in captchas:
+        captchas[(width, height)] = ImageCaptcha(width=width, height=height)
+    return captchas[(width, height)]
+
+
+@lru_cache(maxsize=None)
+def get_canvas(width: int, height: int, color: str = "white") -> Image.Image:
+    """
+    Returns a blank canvas. Callers must `copy()` it before drawing on it.
+    """
+    return Image.new("RGB", (width, height), color)
+
+
+class GlyphAtlas:
+    """
+    Pre-rasterized glyphs of a font, so text made of known characters can be composed
+    by pasting glyph masks instead of rasterizing the text with FreeType every time.
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, characters: str):
+        ascent, descent = font.getmetrics()
+        self.height = ascent + descent
+        self.glyphs: Dict[str, Image.Image] = {}
+        for character in characters:
+            width = int(math.ceil(font.getlength(character)))
+            mask = Image.new("L", (width, self.height), 0)
+            ImageDraw.Draw(mask).text((0, 0), character, fill=255, font=font)
+            self.glyphs[character] = mask
+
+    def text_size(self, text: str) -> Tuple[int, int]:
+        return sum(self.glyphs[c].width for c in text), self.height
+
+    def draw(
+        self,
+        canvas: Image.Image,
+        text: str,
+        fill: Tuple[int, int, int] = (0, 0, 0),
+    ):
+        """
+        Draws the text centered on the canvas.
+        """
+        text_width, text_height = self.text_size(text)
+        x = (canvas.width - text_width) // 2
+        y = (canvas.height - text_height) // 2
+        for character in text:
+            mask = self.glyphs[character]
+            canvas.paste(fill, (x, y, x + mask.width, y + mask.height), mask)
+            x += mask.width
+
+
+@lru_cache(maxsize=None)
+def get_glyph_atlas(size: int, characters: str = MATH_CHARACTERS) -> GlyphAtlas:
+    return GlyphAtlas(get_font(size), characters)
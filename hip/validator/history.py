@@ -0,0 +1,296 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import bittensor as bt
+import numpy as np
+
+# Task types recorded in the history, stored as their index. Other types get the last code.
+HISTORY_TYPES = ["image", "llm", "captcha", "math", "other"]
+CAPTCHA = HISTORY_TYPES.index("captcha")
+
+# Seconds of history the scores are computed over.
+HISTORY_WINDOW = 86400
+
+# The counters kept over the window for each uid.
+COUNTERS = ["correct_answers", "correct_captchas", "captcha_penalties", "wrong_answers"]
+
+
+def min_history_capacity(task_gen_step: float, num_concurrent_forwards: int) -> int:
+    """
+    Returns the records per uid needed to keep every answer of the window: the tasks
+    sent during it, as a miner can be sampled for every task (e.g. when the network has
+    no more miners than the sample size).
+    """
+    return int(np.ceil(HISTORY_WINDOW / task_gen_step)) * num_concurrent_forwards
+
+
+def type_code(task_type: str) -> int:
+    if task_type in HISTORY_TYPES:
+        return HISTORY_TYPES.index(task_type)
+    return len(HISTORY_TYPES) - 1
+
+
+def counter_increments(correct: np.ndarray, captcha) -> np.ndarray:
+    """
+    Returns the increments of the COUNTERS for answers, one row per answer, given
+    whether each answer is correct and whether it answers a captcha.
+    """
+    return np.stack(
+        [correct, correct & captcha, ~correct & captcha, ~correct & ~captcha],
+        axis=1,
+    ).astype(np.int64)
+
+
+class WindowCounters:
+    """
+    Sliding window counts of the answers of every uid. The window is split in time
+    buckets, each holding the counts of the answers given during it, and the totals over
+    the buckets are kept up to date: answers are added to their bucket and the totals,
+    and the buckets falling out of the window are subtracted from the totals. Buckets
+    are shared by all uids, so a bucket expires once for the whole network, and each
+    bucket is expired once: reading the counts does not depend on the number of
+    answers in the window.
+    """
+
+    def __init__(self, n: int, window: int = HISTORY_WINDOW, bucket_seconds: int = 60):
+        """
+        Args:
+            n (int): Number of uids.
+            window (int): Seconds counted.
+            bucket_seconds (int): Seconds per bucket, the precision of the window.
+        """
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.buckets = max(1, window // bucket_seconds)
+        self.counts = np.zeros((n, self.buckets, len(COUNTERS)), dtype=np.uint16)
+        self.totals = np.zeros((n, len(COUNTERS)), dtype=np.int64)
+        # The bucket number (timestamp // bucket_seconds) held by each slot, -1 if empty.
+        self.slot_buckets = np.full(self.buckets, -1, dtype=np.int64)
+        # The oldest bucket number in the window, the ones before it are expired.
+        self.oldest = 0
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def expire(self, now: int):
+        """Moves the window to end at `now`, subtracting the buckets falling out of it."""
+        oldest = now // self.bucket_seconds - self.buckets + 1
+        if oldest <= self.oldest:
+            return
+        # The slots hold at most one window of buckets from the current oldest one.
+        for bucket in range(self.oldest, min(oldest, self.oldest + self.buckets)):
+            slot = bucket % self.buckets
+            if self.slot_buckets[slot] == bucket:
+                self.totals -= self.counts[:, slot]
+                self.counts[:, slot] = 0
+                self.slot_buckets[slot] = -1
+        self.oldest = oldest
+
+    def add(self, uids: np.ndarray, increments: np.ndarray, timestamp: int):
+        """Adds the increments (one row per uid, uids distinct) at the timestamp."""
+        self.expire(timestamp)
+        bucket = timestamp // self.bucket_seconds
+        if bucket < self.oldest:
+            return
+        slot = bucket % self.buckets
+        self.slot_buckets[slot] = max(self.slot_buckets[slot], bucket)
+        self.counts[uids, slot] += increments.astype(np.uint16)
+        self.totals[uids] += increments
+
+    def get(self, uids: Sequence[int], now: int) -> Dict[str, np.ndarray]:
+        """Returns the COUNTERS of each uid over the window ending at `now`."""
+        self.expire(now)
+        totals = self.totals[np.asarray(uids, dtype=np.int64)]
+        return {name: totals[:, i] for i, name in enumerate(COUNTERS)}
+
+    def reset(self, uid: int):
+        self.counts[uid] = 0
+        self.totals[uid] = 0
+
+    def resize(self, n: int) -> "WindowCounters":
+        resized = WindowCounters(n, self.window, self.bucket_seconds)
+        keep = min(n, len(self))
+        resized.counts[:keep] = self.counts[:keep]
+        resized.totals[:keep] = self.totals[:keep]
+        resized.slot_buckets[:] = self.slot_buckets
+        resized.oldest = self.oldest
+        return resized
+
+
+class TaskHistory:
+    """
+    The answers of every miner, stored column-wise in a fixed size ring buffer per uid:
+    the timestamp, whether the answer was correct and the task type code of each
+    record. Once a miner's buffer is full, its oldest records are overwritten. The
+    counts the scores are computed from are kept in WindowCounters.
+    """
+
+    def __init__(self, n: int, capacity: int = 1024, bucket_seconds: int = 60):
+        """
+        Args:
+            n (int): Number of uids.
+            capacity (int): Records kept per uid, enough for the tasks of the window.
+            bucket_seconds (int): Seconds per bucket of the window counters.
+        """
+        self.capacity = capacity
+        self.counters = WindowCounters(n, HISTORY_WINDOW, bucket_seconds)
+        self.timestamps = np.zeros((n, capacity), dtype=np.int64)
+        self.correct = np.zeros((n, capacity), dtype=np.bool_)
+        self.types = np.zeros((n, capacity), dtype=np.uint8)
+        # The slot the next record of each uid is written to, and its number of records.
+        self.heads = np.zeros(n, dtype=np.int64)
+        self.lengths = np.zeros(n, dtype=np.int64)
+        # Timestamp of the last warning about records of the window being overwritten.
+        self.overflow_warned = -HISTORY_WINDOW
+
+    def __len__(self) -> int:
+        return len(self.heads)
+
+    def append(
+        self,
+        uids: Sequence[int],
+        correct: Sequence[bool],
+        timestamp: int,
+        task_type: str,
+    ):
+        """Records the answers of the given (distinct) uids to a task."""
+        uids = np.asarray(uids, dtype=np.int64)
+        correct = np.asarray(correct, dtype=np.bool_)
+        slots = self.heads[uids]
+        full = self.lengths[uids] == self.capacity
+        if full.any() and timestamp - self.overflow_warned >= 3600:
+            overwritten = self.timestamps[uids[full], slots[full]]
+            if (overwritten > timestamp - HISTORY_WINDOW).any():
+                # The counters still count the overwritten answers, but they are lost
+                # when the counters are rebuilt from the records after a restart.
+                bt.logging.warning(
+                    f"The history of {int(full.sum())} miners is full, overwriting "
+                    f"answers of the last {HISTORY_WINDOW}s: increase "
+                    f"--neuron.history_capacity above {self.capacity}"
+                )
+                self.overflow_warned = timestamp
+        self.timestamps[uids, slots] = timestamp
+        self.correct[uids, slots] = correct
+        self.types[uids, slots] = type_code(task_type)
+        self.heads[uids] = (slots + 1) % self.capacity
+        self.lengths[uids] = np.minimum(self.lengths[uids] + 1, self.capacity)
+        increments = counter_increments(
+            correct, np.bool_(type_code(task_type) == CAPTCHA)
+        )
+        self.counters.add(uids, increments, timestamp)
+
+    def window_counts(self, uids: Sequence[int], now: int) -> Dict[str, np.ndarray]:
+        """
+        Counts the answers of each uid in the last HISTORY_WINDOW seconds, to the
+        precision of a counter bucket.
+
+        Returns:
+            Dict[str, np.ndarray]: The number of correct answers, correct captchas,
+            wrong captchas and other wrong answers of each uid.
+        """
+        return self.counters.get(uids, now)
+
+    def reset(self, uid: int):
+        """Forgets the records of a uid, e.g. when its hotkey was replaced."""
+        self.heads[uid] = 0
+        self.lengths[uid] = 0
+        self.counters.reset(uid)
+
+    def resize(self, n: int) -> "TaskHistory":
+        """Returns a copy of the history for `n` uids, keeping the records of the remaining uids."""
+        resized = TaskHistory(n, self.capacity, self.counters.bucket_seconds)
+        keep = min(n, len(self))
+        for name in ("timestamps", "correct", "types", "heads", "lengths"):
+            getattr(resized, name)[:keep] = getattr(self, name)[:keep]
+        resized.counters = self.counters.resize(n)
+        return resized
+
+    def resize_capacity(self, capacity: int) -> "TaskHistory":
+        """Returns a copy of the history keeping up to `capacity` of the latest records per uid."""
+        resized = TaskHistory(len(self), capacity, self.counters.bucket_seconds)
+        keep = min(capacity, self.capacity)
+        lengths = np.minimum(self.lengths, keep)
+        # The slots of the kept records, oldest first, written from the first slot.
+        slots = (
+            self.heads[:, None] - lengths[:, None] + np.arange(keep)[None, :]
+        ) % self.capacity
+        rows = np.arange(len(self))[:, None]
+        for name in ("timestamps", "correct", "types"):
+            getattr(resized, name)[:, :keep] = getattr(self, name)[rows, slots]
+        resized.lengths[:] = lengths
+        resized.heads[:] = lengths % capacity
+        resized.rebuild_counters()
+        return resized
+
+    def rebuild_counters(self):
+        """Recomputes the window counters from the records, e.g. after loading them."""
+        counters = WindowCounters(
+            len(self), HISTORY_WINDOW, self.counters.bucket_seconds
+        )
+        filled = np.arange(self.capacity)[None, :] < self.lengths[:, None]
+        if filled.any():
+            uids, slots = np.nonzero(filled)
+            buckets = self.timestamps[uids, slots] // counters.bucket_seconds
+            # Only the last window of records can be counted, older ones share its slots.
+            recent = buckets > buckets.max() - counters.buckets
+            uids, slots, buckets = uids[recent], slots[recent], buckets[recent]
+            increments = counter_increments(
+                self.correct[uids, slots], self.types[uids, slots] == CAPTCHA
+            )
+            bucket_slots = buckets % counters.buckets
+            np.add.at(counters.counts, (uids, bucket_slots), increments)
+            np.add.at(counters.totals, uids, increments)
+            counters.slot_buckets[bucket_slots] = buckets
+            counters.oldest = int(buckets.max()) - counters.buckets + 1
+        self.counters = counters
+
+    def records(self, uid: int) -> List[Tuple[bool, int, str]]:
+        """Returns the records of a uid, oldest first."""
+        length = int(self.lengths[uid])
+        slots = (self.heads[uid] - length + np.arange(length)) % self.capacity
+        return [
+            (
+                bool(self.correct[uid, slot]),
+                int(self.timestamps[uid, slot]),
+                HISTORY_TYPES[self.types[uid, slot]],
+            )
+            for slot in slots
+        ]
+
+    def state_dict(self) -> Dict[str, np.ndarray]:
+        return {
+            "timestamps": self.timestamps,
+            "correct": self.correct,
+            "types": self.types,
+            "heads": self.heads,
+            "lengths": self.lengths,
+        }
+
+    @classmethod
+    def from_state_dict(
+        cls, state: Dict[str, np.ndarray], capacity: Optional[int] = None
+    ) -> "TaskHistory":
+        """
+        Restores a history from `state_dict`, whose arrays may be tensors, with the
+        given capacity if it differs from the saved one.
+        """
+        n, saved_capacity = state["timestamps"].shape
+        history = cls(n, saved_capacity)
+        for name, value in state.items():
+            getattr(history, name)[:] = np.asarray(value)
+        if capacity is not None and capacity != saved_capacity:
+            return history.resize_capacity(capacity)
+        history.rebuild_counters()
+        return history
+
+    @classmethod
+    def from_lists(
+        cls, tasks_history: List[List[Tuple[bool, int, str]]], capacity: int = 1024
+    ) -> "TaskHistory":
+        """Converts the list based history of older validator states."""
+        history = cls(len(tasks_history), capacity)
+        for uid, records in enumerate(tasks_history):
+            for is_answer_correct, timestamp, task_type in records[-capacity:]:
+                history.append([uid], [is_answer_correct], timestamp, task_type)
+        # The records were not added in time order across uids.
+        history.rebuild_counters()
+        return history
@@ -0,0 +1,121 @@
+import gc
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+import bittensor as bt
+
+
+class ModelRegistry:
+    """
+    Registry of generator models which are loaded lazily on first use.
+
+    Generators register a loader for each backend instead of building the model at
+    import time, so importing the validator (or tooling that only needs the captcha
+    and math generators) does not pay for loading models that are never used.
+    """
+
+    def __init__(self):
+        self.loaders: Dict[str, Callable[[], Any]] = {}
+        self.models: Dict[str, Any] = {}
+        self.last_used: Dict[str, float] = {}
+        self.load_times: Dict[str, float] = {}
+        # Number of threads using each model, see `use`.
+        self.in_use: Dict[str, int] = {}
+        # One lock per model so loading one model does not block the others.
+        self.locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """
+        Registers a loader for a model. The loader is only called on first use.
+
+        Args:
+            name (str): The name of the model.
+            loader (Callable[[], Any]): A function which loads and returns the model.
+        """
+        self.loaders[name] = loader
+        self.locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the model with the given name, loading it if it is not loaded yet.
+        """
+        with self.locks[name]:
+            return self._load(name)
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """
+        Yields the model with the given name, loading it if needed. `unload_idle` does
+        not unload it until it is released, however long it is used.
+        """
+        with self.locks[name]:
+            model = self._load(name)
+            self.in_use[name] = self.in_use.get(name, 0) + 1
+        try:
+            yield model
+        finally:
+            with self.locks[name]:
+                self.in_use[name] -= 1
+                self.last_used[name] = time.monotonic()
+
+    def _load(self, name: str) -> Any:
+        # Called with the lock of the model held.
+        if name not in self.models:
+            bt.logging.info(f"ModelRegistry: loading {name}")
+            start_time = time.perf_counter()
+            self.models[name] = self.loaders[name]()
+            self.load_times[name] = time.perf_counter() - start_time
+            bt.logging.info(
+                f"ModelRegistry: loaded {name} in {self.load_times[name]:.2f}s"
+            )
+        self.last_used[name] = time.monotonic()
+        return self.models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.models
+
+    def unload(self, name: str):
+        """
+        Drops the registry's reference to a model and frees its cached memory.
+        The model is loaded again on its next use.
+        """
+        with self.locks[name]:
+            if self.models.pop(name, None) is None:
+                return
+            self.last_used.pop(name, None)
+        self._free(name)
+
+    def unload_idle(self, max_idle_seconds: float):
+        """
+        Unloads every model which is not in use and has not been used for
+        `max_idle_seconds`.
+        """
+        now = time.monotonic()
+        for name in list(self.last_used):
+            with self.locks[name]:
+                last_used = self.last_used.get(name)
+                if (
+                    last_used is None
+                    or self.in_use.get(name, 0) > 0
+                    or now - last_used <= max_idle_seconds
+                ):
+                    continue
+                self.models.pop(name, None)
+                self.last_used.pop(name, None)
+            self._free(name)
+
+    def _free(self, name: str):
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        bt.logging.info(f"ModelRegistry: unloaded {name}")
+
+
+registry = ModelRegistry()
@@ -0,0 +1,275 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import bittensor as bt
+
+from hip.validator.models import registry
+
+# Approximate memory, in GiB, each model needs on a GPU (fp16 weights and activations).
+MODEL_MEMORY = {"image": 10.0, "text": 16.0}
+# Models which can be split over several GPUs when they do not fit on one.
+SHARDABLE = {"text"}
+
+
+def parse_placement(spec: str) -> Dict[str, List[str]]:
+    """
+    Parses a placement of the form `model=device,device;model=device`, e.g.
+    `image=cuda:0,cuda:1;text=cuda:2+cuda:3`. Every device of a model holds a replica;
+    `+` shards one replica over several GPUs.
+    """
+    placement = {}
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        name, _, devices = entry.partition("=")
+        if not devices:
+            raise ValueError(f"Invalid placement entry: {entry}")
+        placement[name.strip()] = [d.strip() for d in devices.split(",") if d.strip()]
+    return placement
+
+
+def plan_placement(
+    requirements: Dict[str, float], devices: Dict[str, float]
+) -> Dict[str, List[str]]:
+    """
+    Assigns models to devices: the largest models first, each on the device with the
+    most free memory (sharded over several GPUs if none is large enough, or on the cpu
+    if the model can not be sharded), then replicas on every device which still has
+    room, so every GPU is used.
+
+    Args:
+        requirements (Dict[str, float]): Memory needed by each model.
+        devices (Dict[str, float]): Memory of each GPU, none to place everything on the cpu.
+
+    Returns:
+        Dict[str, List[str]]: The devices of the replicas of each model.
+    """
+    if not devices:
+        return {name: ["cpu"] for name in requirements}
+    free = dict(devices)
+    plan: Dict[str, List[str]] = {}
+    by_size = sorted(requirements, key=lambda name: requirements[name], reverse=True)
+    for name in by_size:
+        need = requirements[name]
+        device = max(free, key=lambda d: free[d])
+        if free[device] >= need:
+            plan[name] = [device]
+            free[device] -= need
+            continue
+        if name not in SHARDABLE:
+            bt.logging.warning(f"No GPU has room for {name}, placing it on the cpu")
+            plan[name] = ["cpu"]
+            continue
+        # Shard over the devices with the most free memory.
+        shard: List[str] = []
+        for device in sorted(free, key=lambda d: free[d], reverse=True):
+            shard.append(device)
+            if sum(free[d] for d in shard) >= need:
+                break
+        for device in shard:
+            free[device] = max(0.0, free[device] - need / len(shard))
+        plan[name] = ["+".join(shard)]
+    for name in reversed(by_size):
+        if plan[name] == ["cpu"]:
+            continue
+        for device in free:
+            if device not in plan[name] and free[device] >= requirements[name]:
+                plan[name].append(device)
+                free[device] -= requirements[name]
+    return plan
+
+
+def available_gpus() -> Dict[str, float]:
+    """
+    Returns the free memory, in GiB, of each visible GPU. Memory taken by other
+    processes (e.g. another validator or miner on the same GPU) is not available.
+    """
+    try:
+        import torch
+    except ImportError:
+        return {}
+    if not torch.cuda.is_available():
+        return {}
+    return {
+        f"cuda:{i}": torch.cuda.mem_get_info(i)[0] / 2**30
+        for i in range(torch.cuda.device_count())
+    }
+
+
+def check_devices(name: str, devices: List[str], gpus: Dict[str, float]):
+    """
+    Raises a ValueError if a device of an explicit placement is not a visible GPU or
+    the cpu.
+    """
+    for replica in devices:
+        for device in replica.split("+"):
+            if device not in ("cpu", "auto") and device not in gpus:
+                raise ValueError(
+                    f"Can not place {name} on {device}, visible GPUs: {list(gpus) or 'none'}"
+                )
+
+
+class ModelPlacement:
+    """
+    Replicas of the generator models on their devices. Each replica is a model of the
+    registry, loaded on first use; requests go to the replica with the fewest requests
+    in flight, taking turns between idle replicas. A replica serves one request at a
+    time, as the pipelines are not thread-safe, whichever thread (task pool, task bank
+    refill) the request comes from.
+    """
+
+    def __init__(self):
+        self.loaders: Dict[str, Callable[[str], Any]] = {}
+        self.devices: Dict[str, List[str]] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.busy: Dict[str, float] = {}
+        self.requests: Dict[str, int] = {}
+        self.turn: Dict[str, int] = {}
+        self.replica_locks: Dict[str, threading.Lock] = {}
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[str], Any],
+        devices: Optional[List[str]] = None,
+    ):
+        """
+        Registers a model.
+
+        Args:
+            name (str): The name of the model.
+            loader (Callable[[str], Any]): Loads the model on the given device.
+            devices (Optional[List[str]]): The devices of its replicas until `place` is
+                called, the cpu if not given.
+        """
+        self.loaders[name] = loader
+        self.place(name, devices or ["cpu"])
+
+    def place(self, name: str, devices: List[str]):
+        """Moves the replicas of the model to the given devices."""
+        if not devices:
+            raise ValueError(f"No device given for {name}")
+        self.unload(name)
+        with self.lock:
+            self.devices[name] = list(devices)
+            self.turn[name] = 0
+        for device in devices:
+            key = f"{name}@{device}"
+            registry.register(key, lambda device=device: self.loaders[name](device))
+            self.in_flight.setdefault(key, 0)
+            self.busy.setdefault(key, 0.0)
+            self.requests.setdefault(key, 0)
+            self.replica_locks.setdefault(key, threading.Lock())
+        bt.logging.info(f"ModelPlacement: {name} on {devices}")
+
+    def unload(self, name: str):
+        """Unloads every replica of the model."""
+        for device in self.devices.get(name, []):
+            registry.unload(f"{name}@{device}")
+
+    def _pick(self, name: str) -> str:
+        with self.lock:
+            devices = self.devices[name]
+            turn = self.turn[name]
+            self.turn[name] = (turn + 1) % len(devices)
+            ordered = devices[turn:] + devices[:turn]
+            device = min(ordered, key=lambda d: self.in_flight[f"{name}@{d}"])
+            return f"{name}@{device}"
+
+    def get(self, name: str) -> Any:
+        """Returns a replica of the model, loading it if needed."""
+        return registry.get(self._pick(name))
+
+    @contextmanager
+    def acquire(self, name: str) -> Iterator[Any]:
+        """
+        Yields a replica of the model once no other thread uses it, accounting the time
+        it is used to its device.
+        """
+        key = self._pick(name)
+        with self.lock:
+            self.in_flight[key] += 1
+        try:
+            with self.replica_locks[key]:
+                start_time = time.perf_counter()
+                try:
+                    with registry.use(key) as model:
+                        yield model
+                finally:
+                    with self.lock:
+                        self.busy[key] += time.perf_counter() - start_time
+                        self.requests[key] += 1
+        finally:
+            with self.lock:
+                self.in_flight[key] -= 1
+
+    def utilization(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns, for each device, the share of time its replicas were busy since the
+        start, the requests they served and the GPU memory allocated on it.
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        report: Dict[str, Dict[str, float]] = {}
+        with self.lock:
+            loaded = set()
+            for name, devices in self.devices.items():
+                for replica in devices:
+                    key = f"{name}@{replica}"
+                    for device in replica.split("+"):
+                        stats = report.setdefault(
+                            device, {"busy": 0.0, "requests": 0, "memory_gb": 0.0}
+                        )
+                        stats["busy"] += self.busy[key] / elapsed
+                        stats["requests"] += self.requests[key]
+                        if registry.is_loaded(key):
+                            loaded.add(device)
+        # Only ask the devices holding a model of this process, so no CUDA context is
+        # created in a process which does not generate (e.g. with generator workers).
+        gpus = [device for device in loaded if device.startswith("cuda:")]
+        if gpus:
+            import torch
+
+            for device in gpus:
+                report[device]["memory_gb"] = (
+                    torch.cuda.memory_allocated(device) / 2**30
+                )
+        return report
+
+
+placement = ModelPlacement()
+
+
+def configure_placement(spec: str, text_on_gpu: bool = True):
+    """
+    Places the generator models.
+
+    Args:
+        spec (str): `auto` to plan the placement from the visible GPUs, or an explicit
+            placement (see `parse_placement`). Models it does not name keep their devices.
+        text_on_gpu (bool): Whether the text model runs on a GPU (False for llama.cpp).
+    """
+    gpus = available_gpus()
+    if spec == "auto":
+        requirements = {
+            name: memory
+            for name, memory in MODEL_MEMORY.items()
+            if name in placement.loaders and (name != "text" or text_on_gpu)
+        }
+        if not gpus:
+            bt.logging.warning("No GPU is visible, placing every model on the cpu")
+        plan = plan_placement(requirements, gpus)
+    else:
+        plan = parse_placement(spec)
+        for name, devices in plan.items():
+            check_devices(name, devices, gpus)
+    if not text_on_gpu and "text" in placement.loaders:
+        if plan.get("text", ["cpu"]) != ["cpu"]:
+            # Every replica would be a llama.cpp model using all cpu cores.
+            bt.logging.warning(
+                f"The text backend runs on the cpu, ignoring its placement on {plan['text']}"
+            )
+        plan["text"] = ["cpu"]
+    for name, devices in plan.items():
+        placement.place(name, devices)
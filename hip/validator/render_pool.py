@@ -0,0 +1,65 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+import bittensor as bt
+
+# The process pool used to render image based tasks, None renders in the calling thread.
+render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_up() -> bool:
+    # Importing the renderers and filling their caches is the expensive part of starting a worker.
+    from hip.validator.generators.render_cache import get_glyph_atlas, get_image_captcha
+    import hip.validator.generators.captcha_generator
+    import hip.validator.generators.math_generator
+
+    get_glyph_atlas(32)
+    get_image_captcha()
+    return True
+
+
+def configure_render_pool(workers: int):
+    """
+    Starts a process pool with `workers` pre-warmed workers to render image based tasks.
+    With 0 workers the renderers run in the calling thread.
+
+    Args:
+        workers (int): Number of render worker processes.
+    """
+    global render_pool
+    shutdown_render_pool()
+    if workers <= 0:
+        return
+    # Use spawn: the validator process holds CUDA state and threads which must not be forked.
+    render_pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    # Submit one job per worker so every worker process is started and has imported the renderers.
+    for future in [render_pool.submit(_warm_up) for _ in range(workers)]:
+        future.result()
+    bt.logging.info(f"Render pool started with {workers} workers")
+
+
+def shutdown_render_pool():
+    global render_pool
+    if render_pool is not None:
+        render_pool.shutdown(wait=False, cancel_futures=True)
+        render_pool = None
+
+
+def render(renderer: Callable[..., Tuple[bytes, str]], *args) -> Tuple[bytes, str]:
+    """
+    Runs a renderer in the render pool if one is configured, otherwise in the calling thread.
+
+    Args:
+        renderer (Callable[..., Tuple[bytes, str]]): A picklable, module level function returning
+            the encoded image and its mime type.
+        *args: Arguments passed to the renderer.
+
+    Returns:
+        Tuple[bytes, str]: The encoded image and its mime type.
+    """
+    if render_pool is None:
+        return renderer(*args)
+    return render_pool.submit(renderer, *args).result()
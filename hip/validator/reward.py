@@ -47,6 +47,31 @@ def linear_rewards(self, correct_answers: int) -> float:
     return score_out_of_1 * 65535  # return a value between 0 and 65535
 
 
+def miner_scores(
+    correct_answers: torch.Tensor,
+    captcha_penalties: torch.Tensor,
+    wrong_answers: torch.Tensor,
+) -> torch.Tensor:
+    """
+    Computes the scores of many miners at once from their answers in the last 24 hours:
+    the reward of `linear_rewards` for the correct answers, reduced by 1% per wrong
+    answer and 5% per failed captcha unless the miner answered more than 40 correctly.
+
+    Returns:
+        torch.Tensor: The score of each miner, between 0 and 65535.
+    """
+    correct = correct_answers.double().clamp(0, 480)
+    score_out_of_100 = torch.where(
+        correct <= 100, 0.5 * correct, 0.11753 * correct + 44
+    )
+    score = (score_out_of_100 / 100).clamp(max=1) * 65535
+    penalty = torch.pow(0.99, wrong_answers.double()) * torch.pow(
+        0.95, captcha_penalties.double()
+    )
+    # Currently we do not penalize the score if the miner has answered more than 2 hours in a day
+    return torch.where(correct > 40, score, score * penalty).float()
+
+
 def find_answer_with_highest_count(data):
     # Initialize variables to store the maximum count and corresponding string
     max_count = -1
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, Optional
+
+import bittensor as bt
+
+from hip.protocol import TaskSynapse
+
+
+class TaskScheduler:
+    """
+    Chooses the type of the next task sent to the miners.
+
+    Keeps the served task types close to the target mix over a sliding window, while
+    only choosing types that can be served within the step: either a task is ready in
+    the pool, or the moving average generation cost of the type fits in the step.
+    """
+
+    def __init__(
+        self,
+        weights: Dict[str, float],
+        window: int = 100,
+        smoothing: float = 0.2,
+    ):
+        """
+        Args:
+            weights (Dict[str, float]): Target share of each task type.
+            window (int): Number of served tasks the mix is kept over.
+            smoothing (float): Weight of the latest sample in the moving average cost.
+        """
+        total = sum(weights.values())
+        self.weights = {task_type: w / total for task_type, w in weights.items()}
+        self.smoothing = smoothing
+        self.costs: Dict[str, float] = {}
+        self.served: Deque[str] = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record_cost(self, task_type: str, seconds: float):
+        """Updates the moving average generation cost of a task type."""
+        with self.lock:
+            cost = self.costs.get(task_type)
+            self.costs[task_type] = (
+                seconds
+                if cost is None
+                else self.smoothing * seconds + (1 - self.smoothing) * cost
+            )
+
+    def record_served(self, task_type: str):
+        """Records a task of the given type was sent to the miners."""
+        with self.lock:
+            self.served.append(task_type)
+
+    def timed(
+        self, task_type: str, generator: Callable[[], TaskSynapse]
+    ) -> Callable[[], TaskSynapse]:
+        """
+        Wraps a task generator so its generation cost is recorded.
+        """
+
+        def generate() -> TaskSynapse:
+            start_time = time.perf_counter()
+            task = generator()
+            self.record_cost(task_type, time.perf_counter() - start_time)
+            return task
+
+        return generate
+
+    def deficits(self) -> Dict[str, float]:
+        """
+        Returns how many tasks each type is behind its target share in the window.
+        """
+        with self.lock:
+            counts = Counter(self.served)
+            served = len(self.served)
+        return {
+            task_type: weight * (served + 1) - counts[task_type]
+            for task_type, weight in self.weights.items()
+        }
+
+    def choose(self, pool_sizes: Dict[str, int], budget: Optional[float]) -> str:
+        """
+        Chooses the next task type.
+
+        Args:
+            pool_sizes (Dict[str, int]): Number of ready tasks per type.
+            budget (Optional[float]): Seconds available to generate a task if none is ready, e.g. the step.
+
+        Returns:
+            str: A type with a ready task or which can be generated within the budget,
+            picked at random favouring the types furthest behind their target share.
+            Falls back to the cheapest type when none qualifies.
+        """
+        with self.lock:
+            costs = dict(self.costs)
+        candidates = [
+            task_type
+            for task_type in self.weights
+            if pool_sizes.get(task_type, 0) > 0
+            or (
+                budget is not None and task_type in costs and costs[task_type] <= budget
+            )
+        ]
+        if not candidates:
+            # Nothing fits, the cheapest known type misses the step by the least.
+            cheapest = min(self.weights, key=lambda t: costs.get(t, float("inf")))
+            bt.logging.debug(
+                f"TaskScheduler: no task type fits in {budget}s, choosing {cheapest}"
+            )
+            return cheapest
+
+        deficits = self.deficits()
+        # Types ahead of their share keep a small chance so the order stays unpredictable.
+        weights = [max(deficits[t], 0.0) + 0.01 for t in candidates]
+        return random.choices(candidates, weights=weights, k=1)[0]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the moving average cost and the served share of each type."""
+        with self.lock:
+            counts = Counter(self.served)
+            served = max(len(self.served), 1)
+            return {
+                task_type: {
+                    "cost": self.costs.get(task_type, float("nan")),
+                    "share": counts[task_type] / served,
+                    "target": weight,
+                }
+                for task_type, weight in self.weights.items()
+            }
@@ -0,0 +1,133 @@
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import bittensor as bt
+import torch
+
+
+class StateJournal:
+    """
+    Persists the validator state as an append-only journal of scoring events with
+    periodic snapshots of the full state.
+
+    Every save appends the events recorded since the previous save to `journal.jsonl`,
+    one JSON line per `update_scores` call, so a save writes only the new answers. Every
+    `snapshot_interval` saves with new events, the full state is written to `state.pt`
+    and the journal starts over. Loading reads the snapshot and returns the journal events recorded
+    after it, to be replayed on top of it.
+
+    Events are numbered; the snapshot stores the number of the last event it contains,
+    so the events of a journal which was not truncated (e.g. a crash right after the
+    snapshot was written) are not replayed twice.
+
+    Saves are ignored until `load` has run, so a save of the initial, empty state (the
+    validator syncs before loading its state) can not overwrite the saved state.
+    """
+
+    def __init__(self, directory: str, snapshot_interval: int = 50):
+        """
+        Args:
+            directory (str): Directory of the snapshot and the journal.
+            snapshot_interval (int): Saves with new events between snapshots.
+        """
+        if snapshot_interval < 1:
+            raise ValueError(
+                f"The snapshot interval must be at least 1, got {snapshot_interval}"
+            )
+        self.snapshot_path = os.path.join(directory, "state.pt")
+        self.journal_path = os.path.join(directory, "journal.jsonl")
+        self.snapshot_interval = snapshot_interval
+        self.pending: List[dict] = []
+        self.sequence = 0
+        self.saves = 0
+        self.loaded = False
+
+    def record(
+        self,
+        step: int,
+        timestamp: int,
+        task_type: str,
+        uids: Sequence[int],
+        hotkeys: Sequence[str],
+        correct: Sequence[bool],
+    ):
+        """Records the answers of miners to a task, written by the next `save`."""
+        self.sequence += 1
+        self.pending.append(
+            {
+                "sequence": self.sequence,
+                "step": step,
+                "timestamp": timestamp,
+                "type": task_type,
+                "uids": [int(uid) for uid in uids],
+                "hotkeys": list(hotkeys),
+                "correct": [bool(c) for c in correct],
+            }
+        )
+
+    def save(self, state: dict):
+        """
+        Appends the pending events to the journal, or writes a snapshot of the given
+        state if one is due. Does nothing without pending events.
+        """
+        if not self.loaded:
+            bt.logging.debug("Not saving the state before it was loaded")
+            return
+        # The main loop saves on every iteration, most of which score nothing.
+        if not self.pending:
+            return
+        self.saves += 1
+        if self.saves >= self.snapshot_interval:
+            self.snapshot(state)
+            return
+        with open(self.journal_path, "a") as f:
+            f.write("".join(json.dumps(event) + "\n" for event in self.pending))
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = []
+
+    def snapshot(self, state: dict):
+        """Writes the full state and starts a new journal."""
+        state = dict(state, journal_sequence=self.sequence)
+        # Write to a temporary file first, so a crash never leaves a partial snapshot.
+        temporary_path = self.snapshot_path + ".tmp"
+        torch.save(state, temporary_path)
+        os.replace(temporary_path, self.snapshot_path)
+        open(self.journal_path, "w").close()
+        self.pending = []
+        self.saves = 0
+
+    def load(self) -> Tuple[Optional[dict], List[dict]]:
+        """
+        Returns the snapshot, if any, and the journal events recorded after it, oldest
+        first.
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            snapshot = torch.load(self.snapshot_path)
+        applied = snapshot.get("journal_sequence", 0) if snapshot else 0
+        self.sequence = applied
+
+        events: List[dict] = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                size = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Missing end of line")
+                        event = json.loads(line)
+                    except ValueError:
+                        # The last line of a journal written during a crash can be
+                        # partial. Cut it, so the next events are appended after the
+                        # last complete one.
+                        bt.logging.warning("Dropping a partial state journal entry")
+                        f.truncate(size)
+                        break
+                    size += len(line)
+                    if event["sequence"] > applied:
+                        events.append(event)
+                        self.sequence = event["sequence"]
+        self.loaded = True
+        return snapshot, events
@@ -0,0 +1,77 @@
+import re
+from typing import List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria
+
+SENTENCE_END = re.compile(r"[.!?][\"')\]]?(?=\s|$)")
+
+
+class StopCondition:
+    """
+    When to stop generating the completion of a prompt.
+
+    Args:
+        max_words (Optional[int]): Stop once the completion has this many words.
+        stop_strings (Sequence[str]): Stop as soon as any of these strings is generated.
+        paragraph_end (bool): Stop at the first blank line after some text was generated.
+    """
+
+    def __init__(
+        self,
+        max_words: Optional[int] = None,
+        stop_strings: Sequence[str] = (),
+        paragraph_end: bool = False,
+    ):
+        self.max_words = max_words
+        self.stop_strings = list(stop_strings)
+        if paragraph_end:
+            self.stop_strings.append("\n\n")
+
+    def should_stop(self, text: str) -> bool:
+        if self.max_words is not None and len(text.split()) >= self.max_words:
+            return True
+        stripped = text.lstrip()
+        return any(stop in stripped for stop in self.stop_strings)
+
+    def apply(self, text: str) -> str:
+        """
+        Cuts the completion at the first stop string and, when it ran over the word
+        budget, back to the end of the last complete sentence within the budget.
+        """
+        leading = len(text) - len(text.lstrip())
+        for stop in self.stop_strings:
+            index = text.find(stop, leading)
+            if index != -1:
+                text = text[:index]
+        if self.max_words is not None and len(text.split()) >= self.max_words:
+            words = text.split()[: self.max_words]
+            text = " ".join(words)
+            sentence_ends = list(SENTENCE_END.finditer(text))
+            if sentence_ends:
+                text = text[: sentence_ends[-1].end()]
+        return text.strip()
+
+
+class TextStoppingCriteria(StoppingCriteria):
+    """
+    Stops each sequence of a batch as soon as its completion meets its StopCondition.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, conditions: List[StopCondition]):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.conditions = conditions
+        self.done = torch.zeros(len(conditions), dtype=torch.bool)
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> torch.BoolTensor:
+        for row, condition in enumerate(self.conditions):
+            if self.done[row]:
+                continue
+            text = self.tokenizer.decode(
+                input_ids[row, self.prompt_length :], skip_special_tokens=True
+            )
+            self.done[row] = condition.should_stop(text)
+        return self.done.to(input_ids.device)  # type: ignore
@@ -0,0 +1,376 @@
+import argparse
+import base64
+import json
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bittensor as bt
+import numpy as np
+
+from hip.protocol import TaskSynapse
+
+# Task types are stored as a single byte in the index.
+TASK_TYPES = ["image", "llm", "captcha", "math"]
+
+# Every index entry is a fixed 16 byte record, so the index can be memory-mapped
+# and entry `i` lives at byte `i * INDEX_DTYPE.itemsize`.
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("type", "u1"),
+        ("served", "u1"),
+        ("reserved", "u1", (2,)),
+    ]
+)
+SERVED_FIELD_OFFSET = INDEX_DTYPE.fields["served"][1]  # type: ignore
+
+# Each data record is a little-endian u32 metadata length, the JSON metadata and the raw image bytes.
+RECORD_HEADER = struct.Struct("<I")
+
+
+def encode_task(task: TaskSynapse) -> bytes:
+    """
+    Serializes a task into a data record. Images are stored as raw bytes instead of base64.
+    """
+    image = b""
+    mime = ""
+    if task.image.startswith("data:"):
+        mime, image_base64 = task.image.split(",", 1)
+        image = base64.b64decode(image_base64)
+    elif task.image:
+        # Not a data uri (e.g. a url), keep it as is.
+        mime = task.image
+    meta = json.dumps(
+        {
+            "id": task.id,
+            "label": task.label,
+            "type": task.type,
+            "options": task.options,
+            "value": task.value,
+            "answer": task.answer,
+            "mime": mime,
+        }
+    ).encode("utf-8")
+    return RECORD_HEADER.pack(len(meta)) + meta + image
+
+
+def decode_task(record: bytes) -> TaskSynapse:
+    """
+    Deserializes a data record written by `encode_task` back into a task.
+    """
+    (meta_length,) = RECORD_HEADER.unpack_from(record)
+    meta = json.loads(record[RECORD_HEADER.size : RECORD_HEADER.size + meta_length])
+    image = record[RECORD_HEADER.size + meta_length :]
+    mime = meta.pop("mime")
+    if image:
+        meta["image"] = mime + "," + base64.b64encode(image).decode("utf-8")
+    else:
+        meta["image"] = mime
+    return TaskSynapse(**meta)
+
+
+class TaskBank:
+    """
+    A persistent, append-only bank of pre-generated tasks.
+
+    The bank consists of two files:
+        - `<path>.dat`: the task records, appended one after another.
+        - `<path>.idx`: a fixed-size index entry per record with its offset, length,
+          task type and whether it has already been served.
+
+    Tasks are sampled without repeats: a served task is flagged in the index and is
+    never returned again, even after a restart. `compact` rewrites the bank without
+    its served tasks to reclaim their space.
+    """
+
+    def __init__(self, path: str):
+        self.data_path = path + ".dat"
+        self.index_path = path + ".idx"
+        directory = os.path.dirname(os.path.abspath(self.data_path))
+        os.makedirs(directory, exist_ok=True)
+        self._recover_compaction()
+        for file_path in (self.data_path, self.index_path):
+            if not os.path.exists(file_path):
+                open(file_path, "wb").close()
+
+        self.lock = threading.Lock()
+        self.data_map: Optional[mmap.mmap] = None
+        self._open()
+
+    def _open(self):
+        self.data_file = open(self.data_path, "r+b")
+        self.index_file = open(self.index_path, "r+b")
+
+        index = np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+        self.entries: List[Tuple[int, int, int]] = [
+            (int(entry["offset"]), int(entry["length"]), int(entry["type"]))
+            for entry in index
+        ]
+        # Indices of the tasks which have not been served yet, per task type.
+        self.unserved: Dict[str, List[int]] = {
+            task_type: [] for task_type in TASK_TYPES
+        }
+        for i, entry in enumerate(index):
+            if not entry["served"]:
+                self.unserved[TASK_TYPES[entry["type"]]].append(i)
+        for indices in self.unserved.values():
+            random.shuffle(indices)
+        # Bytes of the data file taken by served tasks, reclaimed by `compact`.
+        self.served_size = int(index["length"][index["served"] != 0].sum())
+
+        self.data_file.seek(0, os.SEEK_END)
+        self.data_size = self.data_file.tell()
+
+    def _recover_compaction(self):
+        """
+        Finishes or rolls back a compaction interrupted by a crash. The new data file
+        replaces the old one before the new index does, so a remaining new index whose
+        data file was already moved in place must be moved in place too.
+        """
+        data_tmp, index_tmp = self.data_path + ".tmp", self.index_path + ".tmp"
+        if os.path.exists(data_tmp):
+            # The old files are still in place, drop the partial compaction.
+            os.unlink(data_tmp)
+            if os.path.exists(index_tmp):
+                os.unlink(index_tmp)
+        elif os.path.exists(index_tmp):
+            os.replace(index_tmp, self.index_path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of unserved tasks per task type."""
+        return {task_type: len(indices) for task_type, indices in self.unserved.items()}
+
+    def append(self, task: TaskSynapse, task_type: str):
+        """
+        Appends a task to the bank.
+        """
+        record = encode_task(task)
+        with self.lock:
+            offset = self.data_size
+            self.data_file.seek(offset)
+            self.data_file.write(record)
+            self.data_file.flush()
+            self.data_size += len(record)
+
+            entry = np.zeros(1, dtype=INDEX_DTYPE)
+            entry["offset"] = offset
+            entry["length"] = len(record)
+            entry["type"] = TASK_TYPES.index(task_type)
+            self.index_file.seek(len(self.entries) * INDEX_DTYPE.itemsize)
+            self.index_file.write(entry.tobytes())
+            self.index_file.flush()
+
+            # Insert at a random position so sampling stays uniform.
+            unserved = self.unserved[task_type]
+            unserved.insert(random.randint(0, len(unserved)), len(self.entries))
+            self.entries.append((offset, len(record), TASK_TYPES.index(task_type)))
+
+    def read(self, i: int) -> TaskSynapse:
+        """
+        Reads the task at index `i`.
+        """
+        offset, length, _ = self.entries[i]
+        if self.data_map is None or offset + length > len(self.data_map):
+            # The data file grew since it was mapped.
+            if self.data_map is not None:
+                self.data_map.close()
+            self.data_map = mmap.mmap(
+                self.data_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        return decode_task(self.data_map[offset : offset + length])
+
+    def sample(self, task_type: str) -> Optional[TaskSynapse]:
+        """
+        Returns a random task of the given type that has not been served before and
+        marks it as served, or None if all tasks of that type have been served.
+        """
+        with self.lock:
+            if not self.unserved[task_type]:
+                return None
+            i = self.unserved[task_type].pop()
+            self.index_file.seek(i * INDEX_DTYPE.itemsize + SERVED_FIELD_OFFSET)
+            self.index_file.write(b"\x01")
+            self.index_file.flush()
+            self.served_size += self.entries[i][1]
+            return self.read(i)
+
+    def compact(self):
+        """
+        Rewrites the bank without its served tasks. The new files are written next to
+        the old ones and moved in place, so a crash leaves either bank intact.
+        """
+        with self.lock:
+            if self.served_size == 0:
+                return
+            kept = sorted(i for indices in self.unserved.values() for i in indices)
+            new_positions = {old: new for new, old in enumerate(kept)}
+            index = np.zeros(len(kept), dtype=INDEX_DTYPE)
+            data_tmp, index_tmp = self.data_path + ".tmp", self.index_path + ".tmp"
+            with open(data_tmp, "wb") as data_file:
+                offset = 0
+                for new, old in enumerate(kept):
+                    old_offset, length, type_code = self.entries[old]
+                    self.data_file.seek(old_offset)
+                    data_file.write(self.data_file.read(length))
+                    index[new] = (offset, length, type_code, 0, (0, 0))
+                    offset += length
+                data_file.flush()
+                os.fsync(data_file.fileno())
+            index.tofile(index_tmp)
+
+            if self.data_map is not None:
+                self.data_map.close()
+                self.data_map = None
+            self.data_file.close()
+            self.index_file.close()
+            os.replace(data_tmp, self.data_path)
+            os.replace(index_tmp, self.index_path)
+
+            unserved = {
+                task_type: [new_positions[i] for i in indices]
+                for task_type, indices in self.unserved.items()
+            }
+            reclaimed = self.served_size
+            self._open()
+            # Keep the sampling order of the remaining tasks.
+            self.unserved = unserved
+        bt.logging.info(
+            f"TaskBank: compacted to {len(self)} tasks, reclaimed {reclaimed / 2**20:.1f} MB"
+        )
+
+    def generator(
+        self, task_type: str, fallback: Callable[[], TaskSynapse]
+    ) -> Callable[[], TaskSynapse]:
+        """
+        Returns a task generator that samples from the bank and falls back to
+        generating a task live when the bank has no unserved task of that type.
+        """
+
+        def generate() -> TaskSynapse:
+            task = self.sample(task_type)
+            if task is None:
+                return fallback()
+            return task
+
+        return generate
+
+    def start_refill(
+        self,
+        generators: Dict[str, Callable[[], TaskSynapse]],
+        min_unserved: int,
+        max_size: int = 0,
+        retry_delay: float = 5,
+    ) -> threading.Thread:
+        """
+        Starts a background thread that appends freshly generated tasks to the bank
+        whenever a task type has fewer than `min_unserved` unserved tasks left. The
+        bank is compacted once served tasks take half of it, and it is not refilled
+        beyond `max_size` bytes (0 for no limit).
+
+        The generators are called from this thread while the task pool calls them too;
+        their models are only used by one thread at a time (see ModelPlacement.acquire).
+        """
+
+        def refill():
+            while True:
+                if self.served_size > self.data_size / 2:
+                    self.compact()
+                counts = self.counts()
+                low = [t for t in generators if counts[t] < min_unserved]
+                if not low or (max_size and self.data_size >= max_size):
+                    time.sleep(retry_delay)
+                    continue
+                task_type = min(low, key=lambda t: counts[t])
+                try:
+                    self.append(generators[task_type](), task_type)
+                except Exception as e:
+                    bt.logging.error(f"TaskBank: error refilling {task_type}: {e}")
+                    time.sleep(retry_delay)
+
+        thread = threading.Thread(target=refill, name="TaskBank-refill", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        with self.lock:
+            if self.data_map is not None:
+                self.data_map.close()
+                self.data_map = None
+            self.data_file.close()
+            self.index_file.close()
+
+
+def main():
+    """
+    Pre-generates tasks into a task bank.
+
+    Example:
+        generate-bank --path ~/.bittensor/task_bank --count 1000 --types captcha math
+    """
+    parser = argparse.ArgumentParser(description="Pre-generate tasks into a task bank.")
+    parser.add_argument(
+        "--path",
+        type=str,
+        required=True,
+        help="Path of the task bank, without extension.",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=1000,
+        help="Number of tasks to generate per task type.",
+    )
+    parser.add_argument(
+        "--types",
+        type=str,
+        nargs="+",
+        default=["captcha", "math"],
+        choices=TASK_TYPES,
+        help="Task types to generate.",
+    )
+    parser.add_argument(
+        "--max_errors",
+        type=int,
+        default=10,
+        help="Consecutive generation errors after which a task type is given up.",
+    )
+    args = parser.parse_args()
+
+    from hip.validator.forward import TASK_GENERATORS
+
+    bank = TaskBank(os.path.expanduser(args.path))
+    bank.compact()
+    for task_type in args.types:
+        generated = 0
+        errors = 0
+        while generated < args.count:
+            try:
+                bank.append(TASK_GENERATORS[task_type](), task_type)
+            except Exception as e:
+                errors += 1
+                print(f"Error generating {task_type} task: {e}")
+                if errors >= args.max_errors:
+                    print(f"Giving up {task_type} after {errors} consecutive errors")
+                    break
+                continue
+            errors = 0
+            generated += 1
+            if generated % 100 == 0:
+                print(f"{task_type}: {generated}/{args.count}")
+    print(
+        f"Task bank {args.path} now holds {len(bank)} tasks, unserved: {bank.counts()}"
+    )
+    bank.close()
+
+
+if __name__ == "__main__":
+    main()
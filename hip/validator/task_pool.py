@@ -0,0 +1,142 @@
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bittensor as bt
+
+from hip.protocol import TaskSynapse
+
+
+class TaskPool:
+    """
+    A bounded pool of pre-generated tasks.
+
+    Each task type gets its own bounded queue which is kept filled by background
+    worker threads, so the forward loop only has to pop a ready-made task instead of
+    running the (potentially slow) generator on the critical path.
+    """
+
+    def __init__(
+        self,
+        generators: Dict[str, Callable[[], TaskSynapse]],
+        size: int = 4,
+        workers_per_type: int = 1,
+        retry_delay: float = 5,
+    ):
+        """
+        Args:
+            generators (Dict[str, Callable[[], TaskSynapse]]): Task generator for each task type.
+            size (int): Number of ready tasks to keep per task type.
+            workers_per_type (int): Number of background workers filling each task type.
+            retry_delay (float): Seconds a worker waits after a failed generation.
+        """
+        self.generators = generators
+        self.size = size
+        self.workers_per_type = workers_per_type
+        self.retry_delay = retry_delay
+        self.queues: Dict[str, "queue.Queue[TaskSynapse]"] = {
+            task_type: queue.Queue(maxsize=size) for task_type in generators
+        }
+        self.should_exit = threading.Event()
+        self.threads: List[threading.Thread] = []
+        # Notified whenever a task of any type is added, see `pop`.
+        self.ready = threading.Condition()
+
+    def start(self):
+        """Starts the background workers filling the pool."""
+        if self.threads:
+            return
+        self.should_exit.clear()
+        for task_type in self.generators:
+            for i in range(self.workers_per_type):
+                thread = threading.Thread(
+                    target=self._fill,
+                    args=(task_type,),
+                    name=f"TaskPool-{task_type}-{i}",
+                    daemon=True,
+                )
+                thread.start()
+                self.threads.append(thread)
+        bt.logging.info(
+            f"TaskPool: started {len(self.threads)} workers for {list(self.generators)}"
+        )
+
+    def stop(self, timeout: float = 5):
+        """Signals the background workers to stop and waits for them to exit."""
+        self.should_exit.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _fill(self, task_type: str):
+        generator = self.generators[task_type]
+        task_queue = self.queues[task_type]
+        while not self.should_exit.is_set():
+            try:
+                task = generator()
+            except Exception as e:
+                bt.logging.error(f"TaskPool: error generating {task_type} task: {e}")
+                self.should_exit.wait(self.retry_delay)
+                continue
+            # Block until there is room in the pool, but keep checking for shutdown.
+            while not self.should_exit.is_set():
+                try:
+                    task_queue.put(task, timeout=1)
+                except queue.Full:
+                    continue
+                with self.ready:
+                    self.ready.notify_all()
+                break
+
+    def get(self, task_type: str, timeout: float = 0) -> Optional[TaskSynapse]:
+        """
+        Pops a ready task of the given type, waiting up to `timeout` seconds for one.
+
+        Returns:
+            Optional[TaskSynapse]: The task, or None if no task of that type is ready.
+        """
+        try:
+            if timeout > 0:
+                return self.queues[task_type].get(timeout=timeout)
+            return self.queues[task_type].get_nowait()
+        except queue.Empty:
+            return None
+
+    def pop(
+        self, task_type: str, timeout: float = 0
+    ) -> Tuple[Optional[TaskSynapse], str]:
+        """
+        Pops a ready task, preferring the given type and falling back to any other
+        type that has a task ready. If none is ready, waits up to `timeout` seconds for
+        the first task of any type, so a slow type (e.g. while its model loads) does
+        not hold up the others.
+
+        Returns:
+            Tuple[Optional[TaskSynapse], str]: The task (or None if the pool stayed empty) and its type.
+        """
+        deadline = time.monotonic() + timeout
+        with self.ready:
+            while True:
+                task, popped_type = self._pop_ready(task_type)
+                remaining = deadline - time.monotonic()
+                if task is not None or remaining <= 0:
+                    return task, popped_type
+                self.ready.wait(remaining)
+
+    def _pop_ready(self, task_type: str) -> Tuple[Optional[TaskSynapse], str]:
+        task = self.get(task_type)
+        if task is not None:
+            return task, task_type
+        fallback_types = [t for t in self.queues if t != task_type]
+        random.shuffle(fallback_types)
+        for fallback_type in fallback_types:
+            task = self.get(fallback_type)
+            if task is not None:
+                return task, fallback_type
+        return None, task_type
+
+    def sizes(self) -> Dict[str, int]:
+        """Returns the number of ready tasks per task type."""
+        return {task_type: q.qsize() for task_type, q in self.queues.items()}
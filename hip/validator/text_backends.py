@@ -0,0 +1,438 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import bittensor as bt
+import numpy as np
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteriaList
+
+from hip.validator.constrained import (
+    Segment,
+    TemplateLogitsProcessor,
+    template_to_gbnf,
+)
+from hip.validator.stopping import StopCondition, TextStoppingCriteria
+
+
+def continuation_start(prompt_ids: Sequence[int], sequence: Sequence[int]) -> int:
+    """
+    Returns the index of the first token of `sequence` (the tokenized prompt followed
+    by a continuation) that differs from the tokenized prompt.
+    """
+    start = 0
+    while start < min(len(prompt_ids), len(sequence)) and (
+        sequence[start] == prompt_ids[start]
+    ):
+        start += 1
+    return max(start, 1)
+
+
+class PerSequenceSamplingProcessor(LogitsProcessor):
+    """
+    Applies temperature, top-k and top-p sampling with different settings for each
+    sequence of a batch, so prompts with different sampling parameters can share a
+    single `generate` call.
+    """
+
+    def __init__(self, temperature: List[float], top_k: List[int], top_p: List[float]):
+        self.temperature = torch.tensor(temperature, dtype=torch.float32)
+        self.top_k = torch.tensor(top_k, dtype=torch.long)
+        self.top_p = torch.tensor(top_p, dtype=torch.float32)
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        temperature = self.temperature.to(scores.device)
+        top_k = self.top_k.to(scores.device)
+        top_p = self.top_p.to(scores.device)
+
+        scores = scores / temperature[:, None]
+        sorted_scores, sorted_indices = torch.sort(scores, descending=True, dim=-1)
+        vocab_size = scores.shape[-1]
+        # A top_k of 0 disables top-k filtering for that sequence.
+        top_k = torch.where(top_k > 0, top_k, torch.full_like(top_k, vocab_size))
+        ranks = torch.arange(vocab_size, device=scores.device)[None, :]
+        remove = ranks >= top_k[:, None]
+        probs = sorted_scores.softmax(dim=-1)
+        # Keep the smallest set of tokens whose cumulative probability exceeds top_p.
+        remove |= (probs.cumsum(dim=-1) - probs) > top_p[:, None]
+        sorted_scores = sorted_scores.masked_fill(remove, -float("inf"))
+        return torch.full_like(scores, -float("inf")).scatter(
+            -1, sorted_indices, sorted_scores
+        )
+
+
+class PrefixCache:
+    """
+    Keeps the attention key/value cache of the most recently used prompt prefixes
+    (e.g. the shared `Context:` block), so prompts starting with the same prefix only
+    encode it once.
+    """
+
+    def __init__(self, model, tokenizer, max_entries: int = 2):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[List[int], object]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, prefix: str, batch_size: int) -> Tuple[List[int], object]:
+        """
+        Returns the token ids of the prefix and a copy of its cache for a batch of
+        `batch_size` sequences, which generation is free to extend.
+        """
+        with self.lock:
+            entry = self.entries.get(prefix)
+            if entry is not None:
+                self.entries.move_to_end(prefix)
+        if entry is None:
+            prefix_ids = self.tokenizer(prefix)["input_ids"]
+            with torch.no_grad():
+                cache = self.model(
+                    input_ids=torch.tensor([prefix_ids], device=self.model.device),
+                    use_cache=True,
+                ).past_key_values
+            entry = (prefix_ids, cache)
+            with self.lock:
+                self.entries[prefix] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        prefix_ids, cache = entry
+        cache = copy.deepcopy(cache)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        return prefix_ids, cache
+
+
+class TransformersBackend:
+    """
+    Text generation with a Hugging Face model, in fp16 on GPU.
+    """
+
+    def __init__(self, model_name: str, device: str = "auto"):
+        """
+        Args:
+            model_name (str): The Hugging Face model name.
+            device (str): `auto` to spread the model over all GPUs, a device such as
+                `cuda:0`, or GPUs joined with `+` (e.g. `cuda:0+cuda:1`) to shard it.
+        """
+        from transformers import pipeline
+
+        kwargs = {}
+        if "+" in device:
+            # Shard over the given GPUs only.
+            gpus = [int(d.split(":")[1]) for d in device.split("+")]
+            kwargs["max_memory"] = {
+                gpu: torch.cuda.get_device_properties(gpu).total_memory for gpu in gpus
+            }
+            device = "auto"
+        self.pipe = pipeline(
+            "text-generation",
+            model=model_name,
+            torch_dtype=torch.float32 if device == "cpu" else torch.float16,
+            device_map=device,
+            model_kwargs=kwargs,
+        )
+        self.model = self.pipe.model
+        self.tokenizer = self.pipe.tokenizer
+        # Batched generation needs left padding and a pad token for decoder-only models.
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.prefix_cache = PrefixCache(self.model, self.tokenizer)
+        # Tokens generated since the model was loaded, e.g. to measure throughput.
+        self.generated_tokens = 0
+
+    def generate(
+        self,
+        prompts: List[str],
+        sampling: List[dict],
+        max_new_tokens: int = 1000,
+        stops: Optional[List[StopCondition]] = None,
+        template: Optional[List[Segment]] = None,
+        prefix: Optional[str] = None,
+    ) -> List[str]:
+        tokenizer = self.tokenizer
+        inputs = None
+        if prefix is not None:
+            inputs = self._prefixed_inputs(prefix, prompts)
+            if inputs is None:
+                prompts = [prefix + prompt for prompt in prompts]
+        if inputs is None:
+            inputs = dict(
+                tokenizer(prompts, return_tensors="pt", padding=True).to(
+                    self.model.device
+                )
+            )
+        prompt_length = inputs["input_ids"].shape[1]
+        processors = []
+        if template is not None:
+            # Sampling is applied after the template mask, so top-k can not drop
+            # every token the template allows.
+            processors.append(
+                TemplateLogitsProcessor(tokenizer, template, prompt_length)
+            )
+        processors.append(
+            PerSequenceSamplingProcessor(
+                temperature=[s["temperature"] for s in sampling],
+                top_k=[s["top_k"] for s in sampling],
+                top_p=[s["top_p"] for s in sampling],
+            )
+        )
+        stopping_criteria = StoppingCriteriaList()
+        if stops is not None:
+            stopping_criteria.append(
+                TextStoppingCriteria(tokenizer, prompt_length, stops)
+            )
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=True,
+                # Disable the built-in warpers, sampling is handled per sequence.
+                temperature=1.0,
+                top_k=0,
+                top_p=1.0,
+                logits_processor=LogitsProcessorList(processors),
+                stopping_criteria=stopping_criteria,
+                pad_token_id=tokenizer.pad_token_id,
+            )
+        elapsed = time.perf_counter() - start_time
+        generated = outputs[:, prompt_length:]
+
+        # Log how many tokens each completion used, padding after a finished sequence excluded.
+        lengths = (generated != tokenizer.pad_token_id).sum(dim=1).tolist()
+        bt.logging.debug(
+            f"generate: {len(prompts)} prompts, lengths {lengths} / {max_new_tokens} tokens, "
+            f"{generated.shape[1]} steps in {elapsed:.2f}s ({sum(lengths) / max(elapsed, 1e-9):.1f} tokens/s)"
+        )
+        self.generated_tokens += sum(lengths)
+        return tokenizer.batch_decode(generated, skip_special_tokens=True)
+
+    def _suffix_ids(self, prefix_ids: List[int], text: str) -> Optional[List[int]]:
+        """
+        Returns the token ids of `text` (which starts with the prefix) after the prefix
+        tokens, or None if the prefix tokens differ from the first tokens of the text,
+        e.g. when a token spans the end of the prefix.
+        """
+        ids = self.tokenizer(text)["input_ids"]
+        if ids[: len(prefix_ids)] != prefix_ids:
+            return None
+        return ids[len(prefix_ids) :]
+
+    def _prefixed_inputs(self, prefix: str, prompts: List[str]) -> Optional[dict]:
+        """
+        Builds the generation inputs of prompts which all follow the same prefix, with
+        the cached prefix followed by the padding and then each prompt. Masked padding
+        does not shift the positions of the prompt tokens.
+
+        The prefix and each prompt are tokenized together and split after the prefix
+        tokens, so the tokens are those of the whole text. Returns None, to generate
+        without the cache, if a prompt does not start at a token boundary.
+        """
+        tokenizer = self.tokenizer
+        prefix_ids = tokenizer(prefix)["input_ids"]
+        suffixes = [self._suffix_ids(prefix_ids, prefix + prompt) for prompt in prompts]
+        if any(suffix is None for suffix in suffixes):
+            bt.logging.debug(
+                "A prompt does not start at a token boundary of the prefix"
+            )
+            return None
+        prefix_ids, cache = self.prefix_cache.get(prefix, len(prompts))
+        length = max(len(suffix) for suffix in suffixes)
+        input_ids = []
+        attention_mask = []
+        for suffix in suffixes:
+            padding = length - len(suffix)
+            input_ids.append(prefix_ids + [tokenizer.pad_token_id] * padding + suffix)
+            attention_mask.append(
+                [1] * len(prefix_ids) + [0] * padding + [1] * len(suffix)
+            )
+        return {
+            "input_ids": torch.tensor(input_ids, device=self.model.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.model.device),
+            "past_key_values": cache,
+        }
+
+    def score_continuations(
+        self, prompt: str, continuations: List[str], prefix: Optional[str] = None
+    ) -> List[float]:
+        """
+        Returns the log-probability of each continuation following the prompt (and
+        the prefix, if given), computed in a single batched forward pass. The cached
+        prefix is only used when the texts split at a token boundary after it, so the
+        scores are those of the whole text.
+        """
+        tokenizer = self.tokenizer
+        prefix_ids, cache = [], None
+        if prefix is not None:
+            # Tokenized with the prefix and split after it, like `_prefixed_inputs`.
+            prefix_ids = tokenizer(prefix)["input_ids"]
+            prompt_ids = self._suffix_ids(prefix_ids, prefix + prompt)
+            sequences = [
+                self._suffix_ids(prefix_ids, prefix + prompt + continuation)
+                for continuation in continuations
+            ]
+            if prompt_ids is None or any(sequence is None for sequence in sequences):
+                prompt, prefix_ids = prefix + prompt, []
+            else:
+                prefix_ids, cache = self.prefix_cache.get(prefix, len(continuations))
+        if cache is None:
+            prompt_ids = tokenizer(prompt)["input_ids"]
+            sequences = [
+                tokenizer(prompt + continuation)["input_ids"]
+                for continuation in continuations
+            ]
+        starts = [continuation_start(prompt_ids, sequence) for sequence in sequences]
+
+        length = max(len(sequence) for sequence in sequences)
+        input_ids = torch.full((len(sequences), length), tokenizer.pad_token_id)
+        attention_mask = torch.zeros(
+            (len(sequences), len(prefix_ids) + length), dtype=torch.long
+        )
+        attention_mask[:, : len(prefix_ids)] = 1
+        for i, sequence in enumerate(sequences):
+            input_ids[i, : len(sequence)] = torch.tensor(sequence)
+            attention_mask[i, len(prefix_ids) : len(prefix_ids) + len(sequence)] = 1
+
+        with torch.no_grad():
+            logits = self.model(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device),
+                past_key_values=cache,
+            ).logits
+        # The logits at position t predict the token at position t + 1.
+        log_probs = torch.log_softmax(logits[:, :-1].float(), dim=-1).cpu()
+        return [
+            float(
+                sum(
+                    log_probs[i, t - 1, sequence[t]]
+                    for t in range(starts[i], len(sequence))
+                )
+            )
+            for i, sequence in enumerate(sequences)
+        ]
+
+
+class LlamaCppBackend:
+    """
+    Text generation on the CPU with a quantized (e.g. int4 / int8 GGUF) model through
+    llama.cpp. Requires the optional `llama-cpp-python` package (the `llama_cpp` extra).
+    """
+
+    def __init__(self, model_path: str, threads: int = 0, context_length: int = 4096):
+        try:
+            from llama_cpp import Llama
+        except ImportError as e:
+            raise ImportError(
+                "The llama_cpp text backend requires llama-cpp-python: "
+                "pip install -e '.[llama_cpp]'"
+            ) from e
+
+        self.llm = Llama(
+            model_path=os.path.expanduser(model_path),
+            n_threads=threads or os.cpu_count(),
+            n_ctx=context_length,
+            # score_continuations reads the logits of every evaluated position.
+            logits_all=True,
+            verbose=False,
+        )
+        # Tokens generated since the model was loaded, e.g. to measure throughput.
+        self.generated_tokens = 0
+
+    def generate(
+        self,
+        prompts: List[str],
+        sampling: List[dict],
+        max_new_tokens: int = 1000,
+        stops: Optional[List[StopCondition]] = None,
+        template: Optional[List[Segment]] = None,
+        prefix: Optional[str] = None,
+    ) -> List[str]:
+        from llama_cpp import LlamaGrammar, StoppingCriteriaList as LlamaStoppingList
+
+        grammar = None
+        if template is not None:
+            grammar = LlamaGrammar.from_string(
+                template_to_gbnf(template), verbose=False
+            )
+
+        if prefix is not None:
+            # llama.cpp reuses the evaluated tokens the next prompt starts with, so
+            # the prefix is only encoded for the first prompt.
+            prompts = [prefix + prompt for prompt in prompts]
+
+        texts = []
+        # llama.cpp completes one prompt at a time.
+        for i, (prompt, params) in enumerate(zip(prompts, sampling)):
+            stopping_criteria = None
+            if stops is not None:
+                prompt_length = len(self.llm.tokenize(prompt.encode("utf-8")))
+                stopping_criteria = LlamaStoppingList(
+                    [self._stopping_criteria(stops[i], prompt_length)]
+                )
+            start_time = time.perf_counter()
+            output = self.llm.create_completion(
+                prompt,
+                max_tokens=max_new_tokens,
+                temperature=params["temperature"],
+                top_k=params["top_k"],
+                top_p=params["top_p"],
+                grammar=grammar,
+                stopping_criteria=stopping_criteria,
+            )
+            elapsed = time.perf_counter() - start_time
+            length = output["usage"]["completion_tokens"]  # type: ignore
+            bt.logging.debug(
+                f"generate: length {length} / {max_new_tokens} tokens in {elapsed:.2f}s "
+                f"({length / max(elapsed, 1e-9):.1f} tokens/s)"
+            )
+            self.generated_tokens += length
+            texts.append(output["choices"][0]["text"])  # type: ignore
+        return texts
+
+    def _stopping_criteria(self, stop: StopCondition, prompt_length: int):
+        def should_stop(input_ids: np.ndarray, logits: np.ndarray) -> bool:
+            text = self.llm.detokenize(input_ids[prompt_length:].tolist())
+            return stop.should_stop(text.decode("utf-8", errors="ignore"))
+
+        return should_stop
+
+    def score_continuations(
+        self, prompt: str, continuations: List[str], prefix: Optional[str] = None
+    ) -> List[float]:
+        """
+        Returns the log-probability of each continuation following the prompt (and
+        the prefix, if given). The prompt is evaluated once and its KV cache is reused
+        for every continuation.
+        """
+        if prefix is not None:
+            prompt = prefix + prompt
+        prompt_ids = self.llm.tokenize(prompt.encode("utf-8"))
+        # Keep the evaluated tokens the prompt starts with, e.g. a shared prefix.
+        evaluated = continuation_start(
+            self.llm.input_ids[: self.llm.n_tokens].tolist(), prompt_ids
+        )
+        self.llm.n_tokens = min(evaluated, len(prompt_ids)) - 1
+        self.llm.eval(prompt_ids[self.llm.n_tokens :])
+        scores = []
+        for continuation in continuations:
+            sequence = self.llm.tokenize((prompt + continuation).encode("utf-8"))
+            start = continuation_start(prompt_ids, sequence)
+            # Rewind the KV cache to just before the first continuation token.
+            self.llm.n_tokens = start - 1
+            total = 0.0
+            for t in range(start - 1, len(sequence) - 1):
+                self.llm.eval([sequence[t]])
+                logits = np.array(
+                    self.llm.scores[self.llm.n_tokens - 1], dtype=np.float64
+                )
+                log_probs = logits - np.logaddexp.reduce(logits)
+                total += float(log_probs[sequence[t + 1]])
+            scores.append(total)
+        return scores
@@ -1,105 +1,167 @@
-from transformers import pipeline
+from hip.validator.constrained import QUESTION_ANSWER_TEMPLATE, max_template_tokens
+from hip.validator.placement import placement
+from hip.validator.stopping import StopCondition
+from hip.validator.text_backends import LlamaCppBackend, TransformersBackend
 from hip.validator.words import get_random_words
+from typing import List, Optional, Tuple
 import torch
 import json
 
+# The text generation backend, see `configure_text_backend`.
+backend_name = "transformers"
 model_name = "HuggingFaceH4/zephyr-7b-beta"
-pipe = pipeline(
-    "text-generation",
-    model=model_name,
-    torch_dtype=torch.float16,
-    device_map="auto",
-)
+threads = 0
+
+
+def configure_text_backend(backend: str, model: str, num_threads: int = 0):
+    """
+    Selects the text generation backend. Takes effect the next time the model is loaded.
+
+    Args:
+        backend (str): `transformers` for a fp16 Hugging Face model on GPU, or
+            `llama_cpp` for a quantized GGUF model on CPU.
+        model (str): The Hugging Face model name, or the path of the GGUF file.
+        num_threads (int): CPU threads used by the llama_cpp backend, 0 for all cores.
+    """
+    global backend_name, model_name, threads
+    if backend not in ("transformers", "llama_cpp"):
+        raise ValueError(f"Unknown text backend: {backend}")
+    backend_name = backend
+    model_name = model
+    threads = num_threads
+
+
+def load_text_backend(device: str):
+    if backend_name == "llama_cpp":
+        return LlamaCppBackend(model_name, threads=threads)
+    return TransformersBackend(model_name, device)
+
+
+placement.register("text", load_text_backend, ["auto"])
+
+
+def get_backend():
+    """
+    Returns a replica of the text generation backend, loading the model on first use.
+    """
+    return placement.get("text")
+
+
+def generate_batch(
+    prompts: List[str],
+    sampling: List[dict],
+    max_new_tokens: int = 1000,
+    stops: Optional[List[StopCondition]] = None,
+    template: Optional[list] = None,
+    prefix: Optional[str] = None,
+) -> List[str]:
+    """
+    Generates completions for several independent prompts, in one padded batch when
+    the backend supports it.
+
+    Args:
+        prompts (List[str]): The prompts to complete.
+        sampling (List[dict]): The `temperature`, `top_k` and `top_p` to use for each prompt.
+        max_new_tokens (int): The maximum number of tokens to generate per prompt.
+        stops (Optional[List[StopCondition]]): When to stop generating each completion.
+        template (Optional[list]): A template (see hip.validator.constrained) the completions must match.
+        prefix (Optional[str]): Text preceding every prompt, e.g. the `context_prefix`. It is
+            encoded once and its attention cache is reused by every prompt.
+
+    Returns:
+        List[str]: The generated text for each prompt, without the prompt.
+    """
+    with placement.acquire("text") as backend:
+        texts = backend.generate(
+            prompts,
+            sampling,
+            max_new_tokens=max_new_tokens,
+            stops=stops,
+            template=template,
+            prefix=prefix,
+        )
+    if stops is not None:
+        texts = [stop.apply(text) for stop, text in zip(stops, texts)]
+    return texts
+
+
+def context_prefix(text: str) -> str:
+    """
+    The block every prompt about a context starts with. Prompts about the same context
+    share it as a prefix, so the backend only encodes the context once.
+    """
+    return f"Context: {text}\n\n"
 
 
 def generate_paragraph():
     [noun, verb, adjective, tone] = get_random_words()
     prompt = f"Write a 150 words paragraph using the following words: {noun}, {verb}, {adjective}. Make sure the tone is {tone}. Paragraph:"
-    outputs = pipe(
-        prompt,
-        max_new_tokens=3000,
-        do_sample=True,
-        temperature=0.7,
-        top_k=50,
-        top_p=0.95,
-    )
-    return f"{outputs[0]['generated_text']}".replace(prompt, "")  # type: ignore
+    return generate_batch(
+        [prompt],
+        sampling=[{"temperature": 0.7, "top_k": 50, "top_p": 0.95}],
+        max_new_tokens=600,
+        stops=[StopCondition(max_words=200, paragraph_end=True)],
+    )[0]
+
+
+# Summaries are asked for 50 words, allow some slack before cutting them.
+SUMMARY_STOP = StopCondition(
+    max_words=80, stop_strings=["Context:", "Summary:"], paragraph_end=True
+)
 
 
 def generate_summaries(text):
     prompt1: str = (
-        f"Generate a concise 50 words summary of the following context. \nContext: {text}\n\nSummary:"
+        "Generate a concise 50 words summary of the context above.\n\nSummary:"
     )
     prompt2: str = (
-        f"Generate a slightly misleading 50 words summary of the following context that can trick the reader to belive the summary is correct \nContext: {text}\n\nSummary:"
+        "Generate a slightly misleading 50 words summary of the context above that can trick the reader to belive the summary is correct.\n\nSummary:"
     )
     prompt3: str = (
-        f"Generate a concise 50 words incorrect summary of the following context that tricks the reader and looks correct if not read properly. Make sure the resulting summary is close to the text in text similarity. \nContext: {text}\n\nSummary:"
-    )
-
-    outputs1 = pipe(
-        prompt1,
-        max_new_tokens=1000,
-        do_sample=True,
-        top_k=50,
-        top_p=0.9,
-        temperature=0.7,
-    )
-
-    outputs2 = pipe(
-        prompt2,
-        max_new_tokens=1000,
-        do_sample=True,
-        top_k=100,
-        top_p=0.95,
-        temperature=0.9,
+        "Generate a concise 50 words incorrect summary of the context above that tricks the reader and looks correct if not read properly. Make sure the resulting summary is close to the text in text similarity.\n\nSummary:"
     )
 
-    outputs3 = pipe(
-        prompt3,
-        max_new_tokens=1000,
-        do_sample=True,
-        top_k=200,
-        top_p=0.98,
-        temperature=1.2,
+    # index 0: correct summary
+    summaries = generate_batch(
+        [prompt1, prompt2, prompt3],
+        sampling=[
+            {"top_k": 50, "top_p": 0.9, "temperature": 0.7},
+            {"top_k": 100, "top_p": 0.95, "temperature": 0.9},
+            {"top_k": 200, "top_p": 0.98, "temperature": 1.2},
+        ],
+        max_new_tokens=250,
+        stops=[SUMMARY_STOP] * 3,
+        prefix=context_prefix(text),
     )
-
-    summaries = [
-        # index 0: correct summary
-        f"{outputs1[0]['generated_text']}".replace(prompt1, ""),  # type: ignore
-        f"{outputs2[0]['generated_text']}".replace(prompt2, ""),  # type: ignore
-        f"{outputs3[0]['generated_text']}".replace(prompt3, ""),  # type: ignore
-    ]
     return summaries
 
 
 def generate_question_answer(text):
-    prompt = f"""Generate a multiple choice question based on the following context.
-Context: {text}
+    prompt = """Generate a multiple choice question based on the context above.
 
 Output must only contain the following JSON format and nothing else:
-{{
+{
     "question": "question text", // question text
     "options": ["option1", "option2", "option3", "option4"], // list of options
     "answer": 0 // index of the correct option
-}}
+}
 
 Output:
 ```json
 """
 
-    outputs = pipe(
-        prompt,
-        max_new_tokens=1000,
-        do_sample=True,
-        top_k=50,
-        top_p=0.9,
-        temperature=0.7,
-    )
-    generated_text = f"{outputs[0]['generated_text']}".replace(prompt, "").replace("```", "")  # type: ignore
+    # Constrain decoding to the JSON format, so the output always parses and
+    # generation stops as soon as the closing brace is generated.
+    generated_text = generate_batch(
+        [prompt],
+        sampling=[{"temperature": 0.7, "top_k": 50, "top_p": 0.9}],
+        max_new_tokens=max_template_tokens(QUESTION_ANSWER_TEMPLATE),
+        template=QUESTION_ANSWER_TEMPLATE,
+        prefix=context_prefix(text),
+    )[0]
     # remove anything before { and after }
     start = generated_text.find("{")
-    end = generated_text.find("}")
+    end = generated_text.rfind("}")
     json_converted = json.loads(generated_text[start : end + 1])
     # make sure the json is in the correct format
     assert "question" in json_converted, "Question key not found in the JSON"
@@ -114,35 +176,40 @@ Output:
     return json_converted
 
 
+SENTIMENT_LABELS = ["Positive", "Negative", "Neutral"]
+
+
+def classify_sentiment(text) -> Tuple[str, float]:
+    """
+    Classifies the sentiment of the text by scoring each label as a continuation of
+    the prompt in a single forward pass, instead of sampling an answer.
+
+    Returns:
+        Tuple[str, float]: The most likely label and its probability among the labels.
+    """
+    prompt = "Select the sentiment of the context above based on given options.\n\nSentiment Options: Positive, Negative, Neutral\n\nSentiment (just the selected sentiment):"
+    with placement.acquire("text") as backend:
+        scores = backend.score_continuations(
+            prompt,
+            [f" {label}" for label in SENTIMENT_LABELS],
+            prefix=context_prefix(text),
+        )
+    probabilities = torch.softmax(torch.tensor(scores), dim=0)
+    best = int(torch.argmax(probabilities))
+    return SENTIMENT_LABELS[best], float(probabilities[best])
+
+
 def get_sentiment(text):
-    prompt = f"Select the sentiment of the following text based on given options: Text: \n{text}\n\nSentiment Options: Positive, Negative, Neutral\n\nSentiment (just the selected sentiment):"
-    outputs = pipe(
-        prompt,
-        max_new_tokens=5,
-        do_sample=True,
-        top_k=50,
-        top_p=0.9,
-        temperature=0.3,
-    )
-    output_text = f"{outputs[0]['generated_text']}".replace(prompt, "").lower()  # type: ignore
-    output_opts = [
-        output_text.find("positive"),
-        output_text.find("negative"),
-        output_text.find("neutral"),
-    ]
-    output = ["Positive", "Negative", "Neutral"][output_opts.index(max(output_opts))]
-    return output
+    sentiment, _ = classify_sentiment(text)
+    return sentiment
 
 
 def generate_caption():
     [noun, verb, adjective, _] = get_random_words()
     prompt = f"Write a 50 words image caption using the following words: {noun}, {verb}, {adjective}. \n Example:\nPeople standing at the time square.\nCaption:"
-    outputs = pipe(
-        prompt,
-        max_new_tokens=1000,
-        do_sample=True,
-        temperature=0.7,
-        top_k=50,
-        top_p=0.95,
-    )
-    return f"{outputs[0]['generated_text']}".replace(prompt, "")  # type: ignore
+    return generate_batch(
+        [prompt],
+        sampling=[{"temperature": 0.7, "top_k": 50, "top_p": 0.95}],
+        max_new_tokens=200,
+        stops=[StopCondition(max_words=80, stop_strings=["\n"])],
+    )[0]
@@ -0,0 +1,492 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import bittensor as bt
+
+from hip.protocol import TaskSynapse
+from hip.validator.placement import placement
+
+# Messages are a `<I` length followed by that many bytes of JSON.
+HEADER = struct.Struct("<I")
+
+
+def send_message(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock: socket.socket) -> dict:
+    def receive(size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed")
+            data += chunk
+        return data
+
+    (length,) = HEADER.unpack(receive(HEADER.size))
+    return json.loads(receive(length))
+
+
+def task_from_dict(data: dict) -> TaskSynapse:
+    return TaskSynapse(
+        **{key: value for key, value in data.items() if key != "required_hash_fields"}
+    )
+
+
+class GeneratorWorkerServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves the tasks of a TaskPool over a Unix socket.
+
+    Requests are `{"op": "get", "type": ..., "wait": seconds}`, answered with the next
+    ready task of that type (or none after `wait` seconds), and `{"op": "health"}`,
+    answered with the pool sizes and the utilization of the worker's devices. The pool
+    only generates while it has room, so a validator which stops taking tasks stops the
+    generation (backpressure).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, task_pool):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.task_pool = task_pool
+        self.started = time.time()
+        super().__init__(socket_path, GeneratorRequestHandler)
+
+
+class GeneratorRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: GeneratorWorkerServer = self.server  # type: ignore
+        while True:
+            try:
+                request = receive_message(self.request)
+            except ConnectionError:
+                return
+            if request["op"] == "get":
+                task = None
+                if request["type"] in server.task_pool.queues:
+                    task = server.task_pool.get(
+                        request["type"], timeout=request["wait"]
+                    )
+                send_message(self.request, {"task": task.to_dict() if task else None})
+            elif request["op"] == "health":
+                send_message(
+                    self.request,
+                    {
+                        "status": "ok",
+                        "pid": os.getpid(),
+                        "uptime": time.time() - server.started,
+                        "sizes": server.task_pool.sizes(),
+                        "utilization": placement.utilization(),
+                    },
+                )
+            else:
+                send_message(self.request, {"error": f"Unknown op {request['op']}"})
+
+
+class GeneratorClient:
+    """
+    Fetches tasks from generator worker processes, see `GeneratorWorkerServer`.
+
+    Each calling thread keeps its own connection to each worker. Workers failing their
+    health check are skipped until they answer again.
+    """
+
+    def __init__(
+        self,
+        socket_paths: List[str],
+        timeout: float = 600,
+        wait: float = 5,
+        health_interval: float = 10,
+        max_wait: float = 120,
+    ):
+        """
+        Args:
+            socket_paths (List[str]): Unix sockets of the workers.
+            timeout (float): Seconds to wait for a worker to answer a request.
+            wait (float): Seconds a worker waits for a task before answering without one.
+            health_interval (float): Seconds between health checks of the workers.
+            max_wait (float): Seconds `get` waits for a task before giving up.
+        """
+        self.socket_paths = socket_paths
+        self.timeout = timeout
+        self.wait = wait
+        self.max_wait = max_wait
+        self.health_interval = health_interval
+        self.healthy: Dict[str, bool] = {path: True for path in socket_paths}
+        self.health: Dict[str, dict] = {}
+        self.local = threading.local()
+        self.next_worker = 0
+        self.lock = threading.Lock()
+        self.should_exit = threading.Event()
+        self.health_thread: Optional[threading.Thread] = None
+
+    def _connection(self, socket_path: str) -> socket.socket:
+        connections = self.local.__dict__.setdefault("connections", {})
+        if socket_path not in connections:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(socket_path)
+            connections[socket_path] = sock
+        return connections[socket_path]
+
+    def request(self, socket_path: str, message: dict) -> dict:
+        try:
+            sock = self._connection(socket_path)
+            send_message(sock, message)
+            return receive_message(sock)
+        except (OSError, ConnectionError):
+            # Drop the connection, the next request reconnects.
+            sock = self.local.__dict__.get("connections", {}).pop(socket_path, None)
+            if sock is not None:
+                sock.close()
+            raise
+
+    def check_health(self) -> Dict[str, dict]:
+        """Asks every worker for its status and marks the workers not answering."""
+        for socket_path in self.socket_paths:
+            try:
+                self.health[socket_path] = self.request(socket_path, {"op": "health"})
+                self.healthy[socket_path] = True
+            except Exception as e:
+                if self.healthy[socket_path]:
+                    bt.logging.warning(f"Generator worker {socket_path} is down: {e}")
+                self.health[socket_path] = {"status": "down"}
+                self.healthy[socket_path] = False
+        return self.health
+
+    def start(self):
+        """Starts checking the health of the workers in the background."""
+
+        def run():
+            while not self.should_exit.wait(self.health_interval):
+                self.check_health()
+
+        self.health_thread = threading.Thread(
+            target=run, name="GeneratorClient-health", daemon=True
+        )
+        self.health_thread.start()
+
+    def stop(self):
+        self.should_exit.set()
+
+    def get(self, task_type: str) -> TaskSynapse:
+        """
+        Returns a task of the given type from the healthy workers, taking turns between
+        them and waiting up to `max_wait` seconds until one has a task ready.
+
+        Raises:
+            RuntimeError: If no worker is healthy.
+            TimeoutError: If no worker had a task ready within `max_wait` seconds.
+        """
+        with self.lock:
+            start = self.next_worker
+            self.next_worker = (self.next_worker + 1) % len(self.socket_paths)
+        order = self.socket_paths[start:] + self.socket_paths[:start]
+        deadline = time.monotonic() + self.max_wait
+        while time.monotonic() < deadline:
+            healthy = [path for path in order if self.healthy[path]]
+            if not healthy:
+                raise RuntimeError("No generator worker is healthy")
+            for socket_path in healthy:
+                try:
+                    response = self.request(
+                        socket_path,
+                        {"op": "get", "type": task_type, "wait": self.wait},
+                    )
+                except Exception as e:
+                    bt.logging.warning(f"Generator worker {socket_path} failed: {e}")
+                    self.healthy[socket_path] = False
+                    continue
+                if response.get("task"):
+                    return task_from_dict(response["task"])
+        raise TimeoutError(
+            f"No generator worker had a {task_type} task ready within {self.max_wait}s"
+        )
+
+    def generator(self, task_type: str):
+        """Returns a task generator fetching tasks of the given type from the workers."""
+        return lambda: self.get(task_type)
+
+
+class WorkerSupervisor:
+    """
+    Spawns generator worker processes and restarts the ones that exit, e.g. after an
+    out of memory error, without affecting the validator process.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        socket_dir: str,
+        gpus: List[str],
+        worker_args: List[str],
+        check_interval: float = 10,
+    ):
+        """
+        Args:
+            count (int): Number of workers.
+            socket_dir (str): Directory of the workers' Unix sockets.
+            gpus (List[str]): GPUs assigned to the workers in turn, none to share all GPUs.
+            worker_args (List[str]): Command line arguments passed to every worker.
+            check_interval (float): Seconds between checks for exited workers.
+        """
+        # Only this user may connect to, or replace, the sockets. chmod fails if another
+        # user created the directory first.
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        os.chmod(socket_dir, 0o700)
+        self.socket_paths = [
+            os.path.join(socket_dir, f"generator-{i}.sock") for i in range(count)
+        ]
+        self.gpus = gpus
+        self.worker_args = worker_args
+        self.check_interval = check_interval
+        self.processes: List[Optional[subprocess.Popen]] = [None] * count
+        self.should_exit = threading.Event()
+
+    def spawn(self, index: int):
+        env = dict(os.environ)
+        args = list(self.worker_args)
+        if self.gpus:
+            # The worker only sees its GPU, as cuda:0.
+            env["CUDA_VISIBLE_DEVICES"] = self.gpus[index % len(self.gpus)]
+            args += ["--image_device", "cuda:0"]
+        self.processes[index] = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "hip.validator.worker_service",
+                "--socket",
+                self.socket_paths[index],
+                "--parent_pid",
+                str(os.getpid()),
+                *args,
+            ],
+            env=env,
+        )
+        bt.logging.info(
+            f"Started generator worker {index} (pid {self.processes[index].pid}) on {self.socket_paths[index]}"  # type: ignore
+        )
+
+    def start(self):
+        for index in range(len(self.processes)):
+            self.spawn(index)
+
+        def run():
+            while not self.should_exit.wait(self.check_interval):
+                for index, process in enumerate(self.processes):
+                    if process is not None and process.poll() is not None:
+                        bt.logging.warning(
+                            f"Generator worker {index} exited with code {process.returncode}, restarting"
+                        )
+                        self.spawn(index)
+
+        threading.Thread(target=run, name="WorkerSupervisor", daemon=True).start()
+
+    def stop(self, timeout: float = 10):
+        """Terminates the workers, killing the ones still running after `timeout` seconds."""
+        self.should_exit.set()
+        running = [p for p in self.processes if p is not None and p.poll() is None]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            try:
+                process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        if running:
+            bt.logging.info(f"Stopped {len(running)} generator workers")
+
+
+def worker_args(config) -> List[str]:
+    """
+    Returns the command line arguments configuring a worker like the validator.
+    """
+    neuron = config.neuron
+    args = [
+        "--pool_size",
+        str(neuron.task_pool_size),
+        "--pool_workers",
+        str(neuron.task_pool_workers),
+        "--image_device",
+        neuron.image_device,
+        "--image_dtype",
+        neuron.image_dtype,
+        "--image_batch_size",
+        str(neuron.image_batch_size),
+        "--placement",
+        neuron.placement,
+        "--text_backend",
+        neuron.text_backend,
+        "--text_model",
+        neuron.text_model,
+        "--text_threads",
+        str(neuron.text_threads),
+        "--render_workers",
+        str(neuron.render_workers),
+        "--encoding.image",
+        neuron.encoding.image,
+        "--encoding.captcha",
+        neuron.encoding.captcha,
+        "--encoding.math",
+        neuron.encoding.math,
+        "--min_sentiment_confidence",
+        str(neuron.min_sentiment_confidence),
+        "--model_idle_timeout",
+        str(neuron.model_idle_timeout),
+    ]
+    if neuron.reuse_llm_context:
+        args.append("--reuse_llm_context")
+    return args
+
+
+def start_idle_unloader(max_idle_seconds: float) -> threading.Thread:
+    """
+    Periodically unloads the models of this process which have been idle for
+    `max_idle_seconds`, see ModelRegistry.unload_idle.
+    """
+    from hip.validator.models import registry
+
+    def run():
+        while True:
+            time.sleep(min(max_idle_seconds, 60))
+            registry.unload_idle(max_idle_seconds)
+
+    thread = threading.Thread(target=run, name="ModelRegistry-unload", daemon=True)
+    thread.start()
+    return thread
+
+
+def exit_with_parent(parent: int, check_interval: float = 5) -> threading.Thread:
+    """
+    Exits the process once its parent, the validator with pid `parent`, has exited,
+    so a validator which crashed without stopping its workers does not leave them
+    holding the GPUs.
+    """
+
+    def run():
+        while os.getppid() == parent:
+            time.sleep(check_interval)
+        bt.logging.warning("The validator exited, stopping the generator worker")
+        os._exit(1)
+
+    thread = threading.Thread(target=run, name="ParentWatch", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    """
+    Runs a generator worker, generating tasks in the background and serving them to
+    the validator over a Unix socket.
+
+    Example:
+        generator-worker --socket ~/generators/generator-0.sock --types image llm
+    """
+    from hip.utils.config import positive_int
+    from hip.validator.encoding import configure_encodings
+    from hip.validator.forward import TASK_GENERATORS
+    from hip.validator.generators.image_generator import configure_image_generator
+    from hip.validator.generators.llm_generator import configure_llm_generator
+    from hip.validator.placement import configure_placement
+    from hip.validator.render_pool import configure_render_pool
+    from hip.validator.task_pool import TaskPool
+    from hip.validator.text_generator import configure_text_backend
+
+    parser = argparse.ArgumentParser(description="Run a task generator worker.")
+    parser.add_argument("--socket", type=str, required=True)
+    parser.add_argument(
+        "--parent_pid",
+        type=int,
+        default=0,
+        help="Exit once this process exits, the parent process if 0.",
+    )
+    parser.add_argument(
+        "--types",
+        type=str,
+        nargs="+",
+        default=list(TASK_GENERATORS),
+        choices=list(TASK_GENERATORS),
+        help="Task types generated by this worker.",
+    )
+    parser.add_argument("--pool_size", type=positive_int, default=4)
+    parser.add_argument("--pool_workers", type=positive_int, default=1)
+    parser.add_argument("--image_device", type=str, default="cuda:1")
+    parser.add_argument("--image_dtype", type=str, default="float16")
+    parser.add_argument("--image_batch_size", type=int, default=4)
+    parser.add_argument("--placement", type=str, default="")
+    parser.add_argument("--text_backend", type=str, default="transformers")
+    parser.add_argument(
+        "--text_model", type=str, default="HuggingFaceH4/zephyr-7b-beta"
+    )
+    parser.add_argument("--text_threads", type=int, default=0)
+    parser.add_argument("--render_workers", type=int, default=0)
+    parser.add_argument("--encoding.image", type=str, default="webp:80")
+    parser.add_argument("--encoding.captcha", type=str, default="png")
+    parser.add_argument("--encoding.math", type=str, default="png8:16")
+    parser.add_argument("--reuse_llm_context", action="store_true")
+    parser.add_argument("--min_sentiment_confidence", type=float, default=0.6)
+    parser.add_argument(
+        "--model_idle_timeout",
+        type=float,
+        default=0,
+        help="Seconds a model can stay unused before it is unloaded, 0 keeps models loaded.",
+    )
+    args = vars(parser.parse_args())
+
+    exit_with_parent(args["parent_pid"] or os.getppid())
+    configure_encodings(
+        image=args["encoding.image"],
+        captcha=args["encoding.captcha"],
+        math=args["encoding.math"],
+    )
+    configure_image_generator(
+        args["image_device"], args["image_dtype"], args["image_batch_size"]
+    )
+    configure_text_backend(
+        args["text_backend"], args["text_model"], args["text_threads"]
+    )
+    if args["placement"]:
+        configure_placement(
+            args["placement"], text_on_gpu=args["text_backend"] == "transformers"
+        )
+    configure_llm_generator(
+        reuse=args["reuse_llm_context"],
+        sentiment_confidence=args["min_sentiment_confidence"],
+    )
+    configure_render_pool(args["render_workers"])
+    # The models live in the workers, so they are unloaded here rather than by the validator.
+    if args["model_idle_timeout"] > 0:
+        start_idle_unloader(args["model_idle_timeout"])
+
+    task_pool = TaskPool(
+        {task_type: TASK_GENERATORS[task_type] for task_type in args["types"]},
+        size=args["pool_size"],
+        workers_per_type=args["pool_workers"],
+    )
+    task_pool.start()
+    server = GeneratorWorkerServer(args["socket"], task_pool)
+    bt.logging.info(f"Generator worker serving {args['types']} on {args['socket']}")
+    try:
+        server.serve_forever()
+    finally:
+        task_pool.stop()
+        server.server_close()
+        os.unlink(args["socket"])
+
+
+if __name__ == "__main__":
+    main()
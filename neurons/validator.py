@@ -17,6 +17,8 @@
 # DEALINGS IN THE SOFTWARE.
 
 
+import atexit
+import os
 import time
 from typing import List
 import torch
@@ -27,6 +29,23 @@ import bittensor as bt
 # Bittensor Validator Template:
 from hip.utils.misc import get_utc_timestamp
 from hip.validator import forward
+from hip.validator.forward import TASK_GENERATORS, TASK_WEIGHTS
+from hip.validator.encoding import configure_encodings
+from hip.validator.dedupe import TaskDeduplicator
+from hip.validator.event_loop import configure_generation_executor
+from hip.validator.generators.image_generator import configure_image_generator
+from hip.validator.generators.llm_generator import configure_llm_generator
+from hip.validator.placement import configure_placement
+from hip.validator.render_pool import configure_render_pool
+from hip.validator.scheduler import TaskScheduler
+from hip.validator.task_bank import TaskBank
+from hip.validator.task_pool import TaskPool
+from hip.validator.text_generator import configure_text_backend
+from hip.validator.worker_service import (
+    GeneratorClient,
+    WorkerSupervisor,
+    worker_args,
+)
 
 # import base validator class which takes care of most of the boilerplate
 from hip.base.validator import BaseValidatorNeuron
@@ -49,6 +68,116 @@ class Validator(BaseValidatorNeuron):
         bt.logging.info("load_state()")
         self.load_state()
 
+        configure_encodings(
+            image=self.config.neuron.encoding.image,
+            captcha=self.config.neuron.encoding.captcha,
+            math=self.config.neuron.encoding.math,
+        )
+
+        configure_image_generator(
+            self.config.neuron.image_device,
+            self.config.neuron.image_dtype,
+            self.config.neuron.image_batch_size,
+        )
+
+        configure_text_backend(
+            self.config.neuron.text_backend,
+            self.config.neuron.text_model,
+            self.config.neuron.text_threads,
+        )
+
+        # With generator workers, the models live, and are placed, in the workers.
+        if self.config.neuron.placement and self.config.neuron.generator_workers == 0:
+            configure_placement(
+                self.config.neuron.placement,
+                text_on_gpu=self.config.neuron.text_backend == "transformers",
+            )
+
+        configure_llm_generator(
+            reuse=self.config.neuron.reuse_llm_context,
+            sentiment_confidence=self.config.neuron.min_sentiment_confidence,
+        )
+
+        # Run blocking generation awaited by forward on its own threads.
+        configure_generation_executor(self.config.neuron.generation_workers)
+
+        generators = TASK_GENERATORS
+        self.generator_supervisor = None
+        if self.config.neuron.generator_workers > 0:
+            # Generate in separate worker processes, so an out of memory error or a hung
+            # model can not take down scoring.
+            socket_dir = self.config.neuron.generator_socket_dir or os.path.join(
+                self.config.neuron.full_path, "generators"
+            )
+            self.generator_supervisor = WorkerSupervisor(
+                self.config.neuron.generator_workers,
+                socket_dir,
+                [gpu for gpu in self.config.neuron.generator_gpus.split(",") if gpu],
+                worker_args(self.config),
+            )
+            self.generator_supervisor.start()
+            # Stop the workers on any exit, so none keeps holding a GPU.
+            atexit.register(self.generator_supervisor.stop)
+            self.generator_client = GeneratorClient(
+                self.generator_supervisor.socket_paths
+            )
+            self.generator_client.start()
+            generators = {
+                task_type: self.generator_client.generator(task_type)
+                for task_type in TASK_GENERATORS
+            }
+        else:
+            # Render captcha and math images in worker processes, off the validator's GIL.
+            configure_render_pool(self.config.neuron.render_workers)
+
+        if self.config.neuron.task_bank_path:
+            # Sample tasks from the task bank and keep it filled in the background.
+            self.task_bank = TaskBank(self.config.neuron.task_bank_path)
+            bt.logging.info(f"Task bank loaded: {self.task_bank.counts()}")
+            self.task_bank.start_refill(
+                generators,
+                min_unserved=self.config.neuron.task_bank_min,
+                max_size=self.config.neuron.task_bank_max_mb * 2**20,
+            )
+            generators = {
+                task_type: self.task_bank.generator(task_type, generator)
+                for task_type, generator in generators.items()
+            }
+
+        # Reject tasks repeating a recent task before they reach the pool.
+        if self.config.neuron.dedupe_window > 0:
+            self.task_deduplicator = TaskDeduplicator(
+                window=self.config.neuron.dedupe_window,
+                error_rate=self.config.neuron.dedupe_error_rate,
+                max_distance=self.config.neuron.dedupe_max_distance,
+            )
+            generators = {
+                task_type: self.task_deduplicator.filter(task_type, generator)
+                for task_type, generator in generators.items()
+            }
+
+        # Choose task types from their generation cost and readiness, keeping the target mix.
+        self.task_scheduler = TaskScheduler(
+            TASK_WEIGHTS, window=self.config.neuron.task_schedule_window
+        )
+        generators = {
+            task_type: self.task_scheduler.timed(task_type, generator)
+            for task_type, generator in generators.items()
+        }
+
+        # Pre-generate tasks in the background so forward only has to pop one.
+        self.task_pool = TaskPool(
+            generators,
+            size=self.config.neuron.task_pool_size,
+            workers_per_type=self.config.neuron.task_pool_workers,
+        )
+        self.task_pool.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if self.generator_supervisor is not None:
+            self.generator_supervisor.stop()
+
     async def forward(self):
         """
         Validator forward pass. Consists of:
@@ -0,0 +1,82 @@
+"""
+Benchmark of the image encodings used for task payloads.
+
+Reports the size of the base64 data uri sent to every miner, the bytes moved per
+forward to `--sample_size` miners, and the encode time for each encoding.
+
+Usage:
+    python scripts/benchmark_encoding.py --image sdxl_sample.png --sample_size 50
+"""
+
+import argparse
+import timeit
+
+from PIL import Image
+
+from hip.validator.encoding import encode_image, to_data_uri
+from hip.validator.generators.captcha_generator import generate_random_string
+from hip.validator.generators.render_cache import (
+    get_canvas,
+    get_glyph_atlas,
+    get_image_captcha,
+)
+
+ENCODINGS = [
+    "png:6",
+    "png:9",
+    "png8:256",
+    "png8:16",
+    "webp:80",
+    "webp:60",
+    "jpeg:80",
+    "webp:80:256",
+]
+
+
+def benchmark(name: str, image: Image.Image, sample_size: int, iterations: int):
+    print(f"\n{name} ({image.width}x{image.height})")
+    print(
+        f"{'encoding':<14} {'bytes/miner':>12} {'bytes/forward':>14} {'encode ms':>10}"
+    )
+    for encoding in ENCODINGS:
+        data, mime_type = encode_image(image, encoding)
+        payload_size = len(to_data_uri(data, mime_type))
+        seconds = timeit.timeit(
+            lambda: encode_image(image, encoding), number=iterations
+        )
+        print(
+            f"{encoding:<14} {payload_size:>12} {payload_size * sample_size:>14} {seconds / iterations * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--image",
+        type=str,
+        default=None,
+        help="A sample generated image, e.g. an SDXL output.",
+    )
+    parser.add_argument(
+        "--sample_size",
+        type=int,
+        default=50,
+        help="Number of miners queried per forward.",
+    )
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    captcha = get_image_captcha().generate_image(generate_random_string())
+    benchmark("captcha", captcha, args.sample_size, args.iterations)
+
+    math_image = get_canvas(200, 100).copy()
+    get_glyph_atlas(32).draw(math_image, "7 * 8 = ?")
+    benchmark("math", math_image, args.sample_size, args.iterations)
+
+    if args.image:
+        benchmark(
+            "image",
+            Image.open(args.image).convert("RGB"),
+            args.sample_size,
+            args.iterations,
+        )
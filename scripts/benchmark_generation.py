@@ -0,0 +1,209 @@
+"""
+Benchmark of the task generators.
+
+Runs every generator `--iterations` times and reports the p50/p95/p99 latency,
+tasks/s, peak RSS and VRAM, and the mean payload size of the generated tasks. The
+llm generator is benchmarked per task type, each run including the generation of
+its context paragraph.
+
+With `--stub`, the image pipeline and the text backend are replaced by stub models
+so the benchmark runs on a CPU-only machine (e.g. in CI) and measures everything but
+the model inference.
+
+Usage:
+    python scripts/benchmark_generation.py --iterations 20 --output results.json
+    python scripts/benchmark_generation.py --stub --baseline results.json
+"""
+
+import argparse
+import json
+import random
+import resource
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+from PIL import Image
+
+from hip.protocol import TaskSynapse
+from hip.validator.generators.captcha_generator import generate_captcha_task
+from hip.validator.generators.image_generator import generate_image_task
+from hip.validator.generators.llm_generator import build_llm_task
+from hip.validator.generators.math_generator import generate_math_task
+from hip.validator.placement import placement
+from hip.validator.render_pool import configure_render_pool, shutdown_render_pool
+from hip.validator import text_generator
+
+
+class StubImagePipeline:
+    """Returns random noise images of the SDXL Turbo output size."""
+
+    def __call__(self, prompt, **kwargs):
+        prompts = [prompt] if isinstance(prompt, str) else prompt
+        images = [
+            Image.fromarray(np.random.randint(0, 256, (512, 512, 3), dtype=np.uint8))
+            for _ in prompts
+        ]
+        return type("Output", (), {"images": images})()
+
+
+class StubTextBackend:
+    """Returns canned text, and a valid answer for templates."""
+
+    WORDS = "the quick brown fox jumps over the lazy dog while it rains".split()
+
+    def generate(self, prompts, sampling, max_new_tokens=1000, **kwargs):
+        if kwargs.get("template") is not None:
+            return [
+                '{"question": "What does the fox do?", "options": ["jumps", "runs", "sleeps", "eats"], "answer": 0}'
+                for _ in prompts
+            ]
+        return [
+            " ".join(random.choices(self.WORDS, k=min(max_new_tokens, 120))) + "."
+            for _ in prompts
+        ]
+
+    def score_continuations(self, prompt, continuations, prefix=None):
+        return [random.uniform(-5, 0) for _ in continuations]
+
+
+def llm_generator(task_type: str) -> Callable[[], TaskSynapse]:
+    def generate() -> TaskSynapse:
+        return build_llm_task(text_generator.generate_paragraph(), task_type)
+
+    return generate
+
+
+GENERATORS: Dict[str, Callable[[], TaskSynapse]] = {
+    "captcha": generate_captcha_task,
+    "math": generate_math_task,
+    "image": generate_image_task,
+    "qa": llm_generator("qa"),
+    "sentiment_analysis": llm_generator("sentiment_analysis"),
+    "summarization": llm_generator("summarization"),
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark(
+    generate: Callable[[], TaskSynapse], iterations: int, warmup: int
+) -> Dict[str, float]:
+    for _ in range(warmup):
+        generate()
+    if torch.cuda.is_available():
+        torch.cuda.reset_peak_memory_stats()
+
+    latencies: List[float] = []
+    payload_sizes: List[int] = []
+    errors = 0
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        task_start = time.perf_counter()
+        try:
+            task = generate()
+        except Exception as e:
+            errors += 1
+            print(f"  error: {e}")
+            continue
+        latencies.append(time.perf_counter() - task_start)
+        payload_sizes.append(len(json.dumps(task.to_dict())))
+    elapsed = time.perf_counter() - start_time
+
+    p50, p95, p99 = (
+        np.percentile(latencies, [50, 95, 99]) if latencies else (np.nan,) * 3
+    )
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "p50_ms": float(p50) * 1000,
+        "p95_ms": float(p95) * 1000,
+        "p99_ms": float(p99) * 1000,
+        "tasks_per_second": len(latencies) / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_vram_mb": (
+            torch.cuda.max_memory_allocated() / 2**20
+            if torch.cuda.is_available()
+            else 0.0
+        ),
+        "payload_bytes": float(np.mean(payload_sizes)) if payload_sizes else 0.0,
+    }
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, dict]):
+    print(
+        f"\n{'generator':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'tasks/s':>8} "
+        f"{'rss MB':>8} {'vram MB':>8} {'payload':>9} {'p50 vs baseline':>16}"
+    )
+    for name, result in results.items():
+        change = ""
+        if name in baseline and baseline[name]["p50_ms"]:
+            change = f"{(result['p50_ms'] / baseline[name]['p50_ms'] - 1) * 100:+.1f}%"
+        print(
+            f"{name:<20} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+            f"{result['tasks_per_second']:>8.2f} {result['peak_rss_mb']:>8.0f} {result['peak_vram_mb']:>8.0f} "
+            f"{result['payload_bytes']:>9.0f} {change:>16}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="Untimed runs per generator, e.g. to load the models.",
+    )
+    parser.add_argument(
+        "--generators",
+        type=str,
+        default=",".join(GENERATORS),
+        help="Comma separated generators to benchmark.",
+    )
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="Replace the image and text models with stubs to run without a GPU.",
+    )
+    parser.add_argument(
+        "--render_workers",
+        type=int,
+        default=0,
+        help="Render pool workers for the captcha and math renderers.",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Write the results to this file."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results of a previous run to compare the p50 latency against.",
+    )
+    args = parser.parse_args()
+
+    if args.stub:
+        placement.register("image", lambda device: StubImagePipeline())
+        placement.register("text", lambda device: StubTextBackend())
+    configure_render_pool(args.render_workers)
+
+    results = {}
+    for name in args.generators.split(","):
+        print(f"Benchmarking {name}...")
+        results[name] = benchmark(GENERATORS[name], args.iterations, args.warmup)
+    shutdown_render_pool()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"stub": args.stub, "results": results}, f, indent=2)
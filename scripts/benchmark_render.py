@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the captcha and math renderers.
+
+Compares the per-task render time of the original renderers, which created a new
+ImageCaptcha and resolved the font on every call, against the cached renderers.
+
+Usage:
+    python scripts/benchmark_render.py --iterations 500
+"""
+
+import argparse
+import timeit
+from io import BytesIO
+
+from captcha.image import ImageCaptcha
+from PIL import Image, ImageDraw, ImageFont
+
+from hip.validator.generators.captcha_generator import (
+    generate_random_string,
+    render_captcha,
+)
+from hip.validator.generators.math_generator import render_math
+
+
+def render_captcha_uncached(captcha_text: str) -> bytes:
+    image = ImageCaptcha()
+    return image.generate(captcha_text).getvalue()
+
+
+def render_math_uncached(math_task: str) -> bytes:
+    width, height = 200, 100
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("arial.ttf", 32)
+    except IOError:
+        font = ImageFont.load_default(size=32)
+    bbox = draw.textbbox((0, 0), math_task, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    draw.text(
+        ((width - text_width) // 2, (height - text_height) // 2),
+        math_task,
+        fill="black",
+        font=font,
+    )
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def benchmark(name: str, renderer, argument: str, iterations: int) -> float:
+    renderer(argument)  # warm up
+    seconds = timeit.timeit(lambda: renderer(argument), number=iterations)
+    per_task_ms = seconds / iterations * 1000
+    print(f"{name:<20} {per_task_ms:8.3f} ms/task")
+    return per_task_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    captcha_text = generate_random_string()
+    math_task = "7 * 8 = ?"
+    before = benchmark(
+        "captcha (before)", render_captcha_uncached, captcha_text, args.iterations
+    )
+    after = benchmark("captcha (after)", render_captcha, captcha_text, args.iterations)
+    print(f"captcha speedup: {before / after:.2f}x")
+    before = benchmark(
+        "math (before)", render_math_uncached, math_task, args.iterations
+    )
+    after = benchmark("math (after)", render_math, math_task, args.iterations)
+    print(f"math speedup: {before / after:.2f}x")
@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the score computation of update_scores.
+
+Compares the original per-miner loop, which called linear_rewards, applied the
+penalties one wrong answer at a time and wrote each score to the scores tensor,
+against the batched miner_scores kernel, for networks of different sizes.
+
+Usage:
+    python scripts/benchmark_scoring.py --iterations 100
+"""
+
+import argparse
+import timeit
+
+import torch
+
+from hip.validator.reward import linear_rewards, miner_scores
+
+
+def score_loop(scores, uids, correct_answers, captcha_penalties, wrong_answers):
+    for i, uid in enumerate(uids):
+        correct = int(correct_answers[i])
+        score = linear_rewards(None, correct)
+        if correct <= 40:
+            for _ in range(int(wrong_answers[i])):
+                score = score * 0.99
+            for _ in range(int(captcha_penalties[i])):
+                score = score * 0.95
+        scores[uid] = torch.FloatTensor([score])
+
+
+def score_kernel(scores, uids, correct_answers, captcha_penalties, wrong_answers):
+    scores[uids] = miner_scores(correct_answers, captcha_penalties, wrong_answers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 1024, 4096])
+    args = parser.parse_args()
+
+    print(f"{'miners':>8} {'loop ms':>10} {'kernel ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        uids = torch.arange(n)
+        # Miners from idle to answering every question, with up to 60 wrong answers.
+        correct_answers = torch.randint(0, 500, (n,))
+        captcha_penalties = torch.randint(0, 20, (n,))
+        wrong_answers = torch.randint(0, 60, (n,))
+        counts = (correct_answers, captcha_penalties, wrong_answers)
+
+        loop_scores = torch.zeros(n)
+        kernel_scores = torch.zeros(n)
+        score_loop(loop_scores, uids.tolist(), *counts)
+        score_kernel(kernel_scores, uids, *counts)
+        assert torch.allclose(loop_scores, kernel_scores, rtol=1e-5), "Scores differ"
+
+        loop = timeit.timeit(
+            lambda: score_loop(loop_scores, uids.tolist(), *counts),
+            number=args.iterations,
+        )
+        kernel = timeit.timeit(
+            lambda: score_kernel(kernel_scores, uids, *counts),
+            number=args.iterations,
+        )
+        print(
+            f"{n:>8} {loop / args.iterations * 1000:>10.3f} "
+            f"{kernel / args.iterations * 1000:>10.3f} {loop / kernel:>7.0f}x"
+        )
@@ -0,0 +1,74 @@
+"""
+Benchmark of the text generation backends.
+
+Runs each llm task step with every backend given on the command line and reports
+the latency of each step and the generation throughput in tokens/s.
+
+Usage:
+    python scripts/benchmark_text_backends.py \\
+        --backend transformers:HuggingFaceH4/zephyr-7b-beta \\
+        --backend llama_cpp:~/models/zephyr-7b-beta.Q4_K_M.gguf --threads 16
+"""
+
+import argparse
+import time
+
+from hip.validator import text_generator
+from hip.validator.placement import placement
+
+
+def timed(name: str, function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start_time
+    print(f"  {name:<20} {elapsed:>8.2f}s")
+    return result, elapsed
+
+
+def benchmark(backend: str, model: str, threads: int, iterations: int):
+    print(f"\n{backend} ({model})")
+    placement.unload("text")
+    text_generator.configure_text_backend(backend, model, threads)
+    backend, load_time = timed("load", text_generator.get_backend)
+
+    total = 0.0
+    start_tokens = backend.generated_tokens
+    for _ in range(iterations):
+        paragraph, elapsed = timed("paragraph", text_generator.generate_paragraph)
+        total += elapsed
+        _, elapsed = timed("summaries", text_generator.generate_summaries, paragraph)
+        total += elapsed
+        _, elapsed = timed(
+            "question_answer", text_generator.generate_question_answer, paragraph
+        )
+        total += elapsed
+        _, elapsed = timed("sentiment", text_generator.classify_sentiment, paragraph)
+        total += elapsed
+    # Sentiment is scored without generating, its time still counts.
+    tokens = backend.generated_tokens - start_tokens
+    print(
+        f"  {'task latency':<20} {total / iterations:>8.2f}s "
+        f"({tokens / total:.1f} tokens/s, load {load_time:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backend",
+        action="append",
+        required=True,
+        help="A backend to benchmark as backend:model, can be repeated.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="CPU threads for the llama_cpp backend, 0 uses all cores.",
+    )
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    for spec in args.backend:
+        backend, model = spec.split(":", 1)
+        benchmark(backend, model, args.threads, args.iterations)
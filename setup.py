@@ -47,6 +47,16 @@ setup(
     license="MIT",
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        # CPU text generation with a quantized model, see --neuron.text_backend
+        "llama_cpp": ["llama-cpp-python==0.2.90"],
+    },
+    entry_points={
+        "console_scripts": [
+            "generate-bank=hip.validator.task_bank:main",
+            "generator-worker=hip.validator.worker_service:main",
+        ],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
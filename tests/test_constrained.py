@@ -0,0 +1,156 @@
+import json
+
+import pytest
+import torch
+
+from hip.validator.constrained import (
+    QUESTION_ANSWER_TEMPLATE,
+    Choice,
+    String,
+    TemplateLogitsProcessor,
+    max_template_tokens,
+    template_state,
+    template_to_gbnf,
+)
+
+TEMPLATE = ['{"q": "', String(5), '", "a": ', Choice(["0", "1"]), "}"]
+
+
+class ToyTokenizer:
+    """A tokenizer over a fixed list of token strings, with the EOS token 0."""
+
+    eos_token_id = 0
+    all_special_ids = [0]
+
+    def __init__(self, tokens):
+        self.tokens = ["</s>"] + tokens
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def id(self, token):
+        return self.tokens.index(token)
+
+    def encode(self, text, add_special_tokens=True):
+        # Greedy longest match.
+        ids = []
+        while text:
+            token = max((t for t in self.tokens if text.startswith(t)), key=len)
+            ids.append(self.id(token))
+            text = text[len(token) :]
+        return ids
+
+    def decode(self, ids):
+        return "".join(self.tokens[i] for i in ids)
+
+    def batch_decode(self, batch):
+        return [self.decode(ids) for ids in batch]
+
+
+CHARACTERS = sorted(
+    set("".join(s for s in QUESTION_ANSWER_TEMPLATE if isinstance(s, str)))
+)
+TOKENIZER = ToyTokenizer(
+    CHARACTERS
+    + [c for c in "abcxyz0123" if c not in CHARACTERS]
+    + ['{"', "q", '": "', "ab", " c", '"', '",', 'b"', '"}', "01", "\n", "\\", 'a\n"']
+)
+
+
+def allowed(text, template=TEMPLATE):
+    processor = TemplateLogitsProcessor(TOKENIZER, template)
+    mask = processor.allowed_tokens(text, len(TOKENIZER))
+    return {TOKENIZER.tokens[i] for i in mask.nonzero().flatten().tolist()}
+
+
+@pytest.mark.parametrize(
+    "text, state",
+    [
+        ("", (0, '{"q": "')),
+        ('{"q', (0, '": "')),
+        ('{"q": "', (1, "")),
+        ('{"q": "ab', (1, "ab")),
+        ('{"q": "ab", "a', (2, '": ')),
+        ('{"q": "ab", "a": ', (3, "")),
+        ('{"q": "ab", "a": 1', (4, "}")),
+        ('{"q": "ab", "a": 1}', (5, "")),
+    ],
+)
+def test_template_state(text, state):
+    assert template_state(TEMPLATE, text) == state
+
+
+def test_literals_allow_only_their_prefixes():
+    assert allowed("") == {"{", '{"'}
+    assert allowed('{"') == {"q"}
+    assert allowed('{"q') == {'"', '": "'}
+
+
+def test_strings_allow_safe_tokens_until_closed():
+    # An empty string can't be closed, nor contain quotes, escapes or newlines.
+    safe = allowed('{"q": "')
+    assert {"a", "ab", " c", "q"} <= safe
+    assert not safe & {'"', '",', 'b"', "\n", "\\", 'a\n"', "</s>"}
+    # Closing tokens must continue into the next literal.
+    started = allowed('{"q": "ab')
+    assert {"a", '"', '",', 'b"'} <= started
+    assert not started & {'"}', "\n", 'a\n"'}
+    # At max_length only closing tokens are left.
+    assert allowed('{"q": "abcde') == {'"', '",'}
+
+
+def test_choices_allow_only_their_values():
+    assert allowed('{"q": "ab", "a": ') == {"0", "1"}
+
+
+def test_complete_templates_allow_only_eos():
+    assert allowed('{"q": "ab", "a": 1}') == {"</s>"}
+
+
+def test_processor_masks_each_row_after_the_prompt():
+    prompt = torch.tensor([[TOKENIZER.id("x")] * 3] * 2)
+    generated = torch.tensor(
+        [
+            [TOKENIZER.id(t) for t in ['{"', "q", '": "', "ab"]],
+            [TOKENIZER.id(t) for t in ["{", '"', "q", '"']],
+        ]
+    )
+    processor = TemplateLogitsProcessor(TOKENIZER, TEMPLATE)
+    # The prompt length is taken from the first call, before any generated token.
+    scores = processor(prompt, torch.zeros(2, len(TOKENIZER)))
+    assert processor.prompt_length == 3
+    assert (~torch.isinf(scores)).sum(-1).tolist() == [2, 2]
+    scores = processor(
+        torch.cat([prompt, generated], 1), torch.zeros(2, len(TOKENIZER))
+    )
+    assert scores[0, TOKENIZER.id("ab")] == 0
+    assert torch.isinf(scores[0, TOKENIZER.id("\n")])
+    assert torch.isinf(scores[1, TOKENIZER.id("ab")])
+    assert scores[1, TOKENIZER.id(":")] == 0
+
+
+def test_random_generations_are_valid_json():
+    generator = torch.Generator().manual_seed(0)
+    for _ in range(5):
+        processor = TemplateLogitsProcessor(TOKENIZER, QUESTION_ANSWER_TEMPLATE)
+        input_ids = torch.tensor([[TOKENIZER.id("x")]])
+        for _ in range(max_template_tokens(QUESTION_ANSWER_TEMPLATE)):
+            scores = torch.rand(1, len(TOKENIZER), generator=generator)
+            token_id = processor(input_ids, scores).argmax(-1, keepdim=True)
+            input_ids = torch.cat([input_ids, token_id], dim=1)
+            if token_id.item() == TOKENIZER.eos_token_id:
+                break
+        assert input_ids[0, -1] == TOKENIZER.eos_token_id
+        value = json.loads(TOKENIZER.decode(input_ids[0, 1:-1].tolist()))
+        assert len(value["options"]) == 4
+        assert value["answer"] in range(4)
+
+
+def test_max_template_tokens():
+    assert max_template_tokens(TEMPLATE) == 1 + 7 + 5 + 8 + 1 + 1
+
+
+def test_template_to_gbnf():
+    assert template_to_gbnf(TEMPLATE) == (
+        r'root ::= "{\"q\": \"" [^"\\\n\r\t]{1,5} "\", \"a\": " ("0" | "1") "}"'
+    )
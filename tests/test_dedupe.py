@@ -0,0 +1,113 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from hip.validator.dedupe import (
+    BloomFilter,
+    RotatingBloomFilter,
+    SimHashIndex,
+    TaskDeduplicator,
+    simhash,
+)
+from hip.validator.generators.llm_generator import SENTIMENT_TASK_LABEL
+
+
+def paragraph(seed, words=120):
+    rng = random.Random(seed)
+    return " ".join(
+        "".join(rng.choice("abcdefghij") for _ in range(5)) for _ in range(words)
+    )
+
+
+def task(answer="", value="", label="", image="", options=()):
+    return SimpleNamespace(
+        id="id", answer=answer, value=value, label=label, image=image, options=options
+    )
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.001)
+    keys = [f"key-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 50
+
+
+def test_rotating_bloom_filter_forgets_old_keys():
+    bloom = RotatingBloomFilter(10, 0.001)
+    for i in range(30):
+        bloom.add(f"key-{i}")
+    # Between the last 5 and the last 10 keys are remembered.
+    assert all(f"key-{i}" in bloom for i in range(25, 30))
+    assert not any(f"key-{i}" in bloom for i in range(0, 15))
+
+
+def test_simhash_of_similar_texts_is_close():
+    text = paragraph(0)
+    words = text.split()
+    words[60] = "changed"
+    edited = " ".join(words)
+    assert bin(simhash(text) ^ simhash(edited)).count("1") <= 3
+    assert bin(simhash(text) ^ simhash(paragraph(1))).count("1") > 3
+
+
+def test_simhash_index_evicts_the_oldest():
+    index = SimHashIndex(capacity=2, max_distance=3)
+    fingerprints = [simhash(paragraph(seed)) for seed in range(3)]
+    for fingerprint in fingerprints:
+        index.add(fingerprint)
+    assert fingerprints[0] not in index
+    assert fingerprints[1] in index
+    assert fingerprints[2] ^ 0b101 in index
+
+
+def test_rejects_exact_repeats():
+    deduplicator = TaskDeduplicator()
+    assert deduplicator.check(task(answer="ab12"), "captcha")
+    assert not deduplicator.check(task(answer="ab12"), "captcha")
+    assert deduplicator.check(task(answer="cd34"), "captcha")
+    # Types are remembered separately.
+    assert deduplicator.check(task(answer="ab12"), "image")
+
+
+def test_images_of_the_same_subject_are_rejected():
+    deduplicator = TaskDeduplicator()
+    assert deduplicator.check(task(answer="cat", options=["cat", "dog"]), "image")
+    assert not deduplicator.check(task(answer="Cat", options=["cow", "cat"]), "image")
+    assert deduplicator.check(task(answer="dog", options=["cat", "dog"]), "image")
+
+
+def test_rejects_near_duplicate_paragraphs():
+    deduplicator = TaskDeduplicator()
+    text = paragraph(0)
+    edited = text.replace(text.split()[60], "changed")
+    assert deduplicator.check(task(value=text), "llm")
+    assert not deduplicator.check(task(value=edited), "llm")
+    assert deduplicator.check(task(value=paragraph(1)), "llm")
+
+
+def test_tasks_of_a_context_bundle_are_not_compared():
+    deduplicator = TaskDeduplicator()
+    text = paragraph(0)
+    assert deduplicator.check(task(value=text), "llm")
+    assert deduplicator.check(task(value=text, label=SENTIMENT_TASK_LABEL), "llm")
+    assert not deduplicator.check(task(value=text, label=SENTIMENT_TASK_LABEL), "llm")
+
+
+def test_filter_retries_duplicates():
+    deduplicator = TaskDeduplicator(attempts=3)
+    answers = iter(["a", "a", "b"])
+    generate = deduplicator.filter("captcha", lambda: task(answer=next(answers)))
+    assert generate().answer == "a"
+    assert generate().answer == "b"
+
+
+def test_filter_gives_up_after_its_attempts():
+    deduplicator = TaskDeduplicator(attempts=3)
+    generate = deduplicator.filter("captcha", lambda: task(answer="a"))
+    generate()
+    with pytest.raises(ValueError):
+        generate()
@@ -0,0 +1,171 @@
+import random
+
+import numpy as np
+
+from hip.validator.history import (
+    COUNTERS,
+    HISTORY_WINDOW,
+    TaskHistory,
+    WindowCounters,
+    min_history_capacity,
+)
+
+START_TIME = 1_700_000_000
+TYPES = ["image", "llm", "captcha", "math"]
+
+
+def random_answers(history, steps, seed=0, timestamp=START_TIME, gaps=(60, 600)):
+    """Appends random answers, returns the records of each uid and the last timestamp."""
+    rng = random.Random(seed)
+    records = [[] for _ in range(len(history))]
+    for _ in range(steps):
+        timestamp += rng.randint(*gaps)
+        uids = rng.sample(range(len(history)), rng.randint(1, len(history)))
+        correct = [rng.random() < 0.6 for _ in uids]
+        task_type = rng.choice(TYPES)
+        history.append(uids, correct, timestamp, task_type)
+        for uid, c in zip(uids, correct):
+            records[uid].append((c, timestamp, task_type))
+    return records, timestamp
+
+
+def brute_force_counts(records, now, bucket_seconds=60):
+    """The COUNTERS of a list of (correct, timestamp, type), in the window ending at now."""
+    oldest = now // bucket_seconds - HISTORY_WINDOW // bucket_seconds + 1
+    counts = dict.fromkeys(COUNTERS, 0)
+    for correct, timestamp, task_type in records:
+        if timestamp // bucket_seconds < oldest:
+            continue
+        captcha = task_type == "captcha"
+        counts["correct_answers"] += correct
+        counts["correct_captchas"] += correct and captcha
+        counts["captcha_penalties"] += not correct and captcha
+        counts["wrong_answers"] += not correct and not captcha
+    return counts
+
+
+def assert_counts_match(history, records, now):
+    counts = history.window_counts(range(len(history)), now)
+    for uid, uid_records in enumerate(records):
+        expected = brute_force_counts(uid_records, now)
+        assert {name: int(counts[name][uid]) for name in COUNTERS} == expected
+
+
+def test_records_are_kept_in_order():
+    history = TaskHistory(8, capacity=2048)
+    records, _ = random_answers(history, 300)
+    for uid in range(len(history)):
+        assert history.records(uid) == records[uid]
+
+
+def test_ring_buffer_keeps_the_latest_records():
+    history = TaskHistory(2, capacity=4)
+    for i in range(6):
+        history.append([0], [i % 2 == 0], START_TIME + i, "math")
+    assert [timestamp for _, timestamp, _ in history.records(0)] == [
+        START_TIME + i for i in range(2, 6)
+    ]
+    assert history.records(1) == []
+
+
+def test_state_dict_round_trip():
+    history = TaskHistory(4, capacity=16)
+    random_answers(history, 50)
+    restored = TaskHistory.from_state_dict(history.state_dict())
+    for uid in range(len(history)):
+        assert restored.records(uid) == history.records(uid)
+
+
+def test_from_lists_keeps_the_latest_records():
+    records = [
+        [(i % 3 == 0, START_TIME + i, "llm") for i in range(10)],
+        [(True, START_TIME, "other-type")],
+    ]
+    history = TaskHistory.from_lists(records, capacity=4)
+    assert history.records(0) == records[0][-4:]
+    assert history.records(1) == [(True, START_TIME, "other")]
+
+
+def test_resize_capacity_keeps_the_latest_records():
+    history = TaskHistory(3, capacity=8)
+    records, timestamp = random_answers(history, 20)
+    for capacity in (4, 8, 16):
+        resized = history.resize_capacity(capacity)
+        for uid in range(len(history)):
+            # The history only kept the latest 8 records.
+            assert resized.records(uid) == records[uid][-min(capacity, 8) :]
+        resized.append([0], [True], timestamp + 60, "math")
+        assert resized.records(0)[-1] == (True, timestamp + 60, "math")
+
+
+def test_reset_and_resize_keep_the_other_uids():
+    history = TaskHistory(4, capacity=64)
+    records, _ = random_answers(history, 30)
+    history.reset(2)
+    assert history.records(2) == []
+    grown = history.resize(6)
+    assert len(grown) == 6
+    assert grown.records(0) == records[0]
+    assert grown.records(5) == []
+    shrunk = history.resize(2)
+    assert [shrunk.records(uid) for uid in range(2)] == records[:2]
+
+
+def test_min_history_capacity():
+    assert min_history_capacity(180, 1) == 480
+    assert min_history_capacity(100, 2) == 1728
+
+
+def test_window_counts_match_brute_force():
+    history = TaskHistory(8, capacity=2048)
+    records, timestamp = random_answers(history, 1000)
+    assert_counts_match(history, records, timestamp)
+    # Later reads expire the old answers.
+    for later in (timestamp + 3600, timestamp + HISTORY_WINDOW - 60):
+        assert_counts_match(history, records, later)
+
+
+def test_window_counts_after_long_gaps():
+    history = TaskHistory(4, capacity=2048)
+    records, timestamp = random_answers(history, 300, gaps=(60, 3 * HISTORY_WINDOW))
+    assert_counts_match(history, records, timestamp)
+    assert_counts_match(history, records, timestamp + 2 * HISTORY_WINDOW)
+    counts = history.window_counts([0], timestamp + 2 * HISTORY_WINDOW)
+    assert counts["correct_answers"].tolist() == [0]
+
+
+def test_rebuilt_counters_match_live_counters():
+    history = TaskHistory(8, capacity=2048)
+    records, timestamp = random_answers(history, 800)
+    assert_counts_match(
+        TaskHistory.from_state_dict(history.state_dict()), records, timestamp
+    )
+    assert_counts_match(
+        TaskHistory.from_lists(records, capacity=2048), records, timestamp
+    )
+
+
+def test_counters_count_overwritten_records():
+    history = TaskHistory(2, capacity=4)
+    for i in range(6):
+        history.append([0], [i % 2 == 0], START_TIME + i, "math")
+    counts = history.window_counts([0], START_TIME + 5)
+    assert counts["correct_answers"][0] == 3
+    assert counts["wrong_answers"][0] == 3
+
+
+def test_counters_follow_reset_and_resize():
+    history = TaskHistory(4, capacity=64)
+    records, timestamp = random_answers(history, 30)
+    history.reset(2)
+    records[2] = []
+    assert_counts_match(history.resize(6), records + [[], []], timestamp)
+    assert_counts_match(history.resize(2), records[:2], timestamp)
+
+
+def test_window_counters_expire_whole_buckets():
+    counters = WindowCounters(2, window=600, bucket_seconds=60)
+    counters.add(np.array([0, 1]), np.array([[1, 0, 0, 0], [0, 0, 0, 1]]), 1000)
+    assert counters.get([0, 1], 1000 + 540)["correct_answers"].tolist() == [1, 0]
+    assert counters.get([0, 1], 1000 + 600)["correct_answers"].tolist() == [0, 0]
+    assert counters.get([1], 1000 + 600)["wrong_answers"].tolist() == [0]
@@ -0,0 +1,63 @@
+import pytest
+
+from hip.validator import text_generator
+from hip.validator.generators import llm_generator
+from hip.validator.generators.llm_generator import (
+    SENTIMENT_TASK_LABEL,
+    generate_llm_task,
+    generate_llm_task_bundle,
+)
+
+
+@pytest.fixture
+def unsure_sentiment(monkeypatch):
+    """A text model which is unsure about the sentiment of its paragraphs."""
+    paragraphs = []
+
+    def generate_paragraph():
+        paragraphs.append(f"Paragraph {len(paragraphs)}.")
+        return paragraphs[-1]
+
+    monkeypatch.setattr(text_generator, "generate_paragraph", generate_paragraph)
+    monkeypatch.setattr(
+        text_generator, "classify_sentiment", lambda text: ("Neutral", 0.4)
+    )
+    monkeypatch.setattr(
+        text_generator,
+        "generate_question_answer",
+        lambda text: {"question": "Q?", "options": ["a", "b", "c", "d"], "answer": 1},
+    )
+    monkeypatch.setattr(
+        text_generator, "generate_summaries", lambda text: ["s1", "s2", "s3", "s4"]
+    )
+    llm_generator.configure_llm_generator(False, sentiment_confidence=0.6)
+    yield paragraphs
+    llm_generator.configure_llm_generator(False)
+    llm_generator.bundled_tasks.clear()
+
+
+def test_unsure_sentiment_uses_the_paragraph_for_another_type(
+    unsure_sentiment, monkeypatch
+):
+    def choice(values):
+        return "sentiment_analysis" if "sentiment_analysis" in values else values[0]
+
+    monkeypatch.setattr(llm_generator.random, "choice", choice)
+    task = generate_llm_task()
+    assert task.label != SENTIMENT_TASK_LABEL
+    assert task.value == "Paragraph 0."
+    assert unsure_sentiment == ["Paragraph 0."]
+
+
+def test_unsure_sentiment_is_left_out_of_the_bundle(unsure_sentiment):
+    tasks = generate_llm_task_bundle()
+    assert len(tasks) == 2
+    assert all(task.label != SENTIMENT_TASK_LABEL for task in tasks)
+    assert {task.value for task in tasks} == {"Paragraph 0."}
+
+
+def test_confident_sentiment_is_kept(unsure_sentiment):
+    llm_generator.configure_llm_generator(False, sentiment_confidence=0.3)
+    task = llm_generator.build_llm_task("Paragraph.", "sentiment_analysis")
+    assert task.label == SENTIMENT_TASK_LABEL
+    assert task.answer == "Neutral"
@@ -0,0 +1,61 @@
+import time
+
+from hip.validator.models import ModelRegistry
+from hip.validator.placement import ModelPlacement
+
+
+def counting_registry():
+    registry = ModelRegistry()
+    loads = []
+    registry.register("model", lambda: loads.append(1) or object())
+    return registry, loads
+
+
+def test_models_load_once_on_first_use():
+    registry, loads = counting_registry()
+    assert not registry.is_loaded("model")
+    assert registry.get("model") is registry.get("model")
+    assert loads == [1]
+
+
+def test_unload_idle_unloads_unused_models():
+    registry, loads = counting_registry()
+    registry.get("model")
+    registry.unload_idle(60)
+    assert registry.is_loaded("model")
+    time.sleep(0.01)
+    registry.unload_idle(0)
+    assert not registry.is_loaded("model")
+    registry.get("model")
+    assert loads == [1, 1]
+
+
+def test_unload_idle_keeps_models_in_use():
+    registry, loads = counting_registry()
+    with registry.use("model") as model:
+        time.sleep(0.01)
+        registry.unload_idle(0)
+        assert registry.is_loaded("model")
+        assert registry.get("model") is model
+    # Released just now: idle for less than a minute.
+    registry.unload_idle(60)
+    assert registry.is_loaded("model")
+    time.sleep(0.01)
+    registry.unload_idle(0)
+    assert not registry.is_loaded("model")
+    assert loads == [1]
+
+
+def test_acquired_replicas_are_not_unloaded(monkeypatch):
+    registry, _ = counting_registry()
+    monkeypatch.setattr("hip.validator.placement.registry", registry)
+    placement = ModelPlacement()
+    placement.register("text", lambda device: device, ["cpu"])
+    with placement.acquire("text") as model:
+        time.sleep(0.01)
+        registry.unload_idle(0)
+        assert model == "cpu"
+        assert registry.is_loaded("text@cpu")
+    time.sleep(0.01)
+    registry.unload_idle(0)
+    assert not registry.is_loaded("text@cpu")
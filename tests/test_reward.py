@@ -0,0 +1,57 @@
+import torch
+
+from hip.validator.reward import linear_rewards, miner_scores
+
+
+def loop_score(correct, captcha_penalties, wrong):
+    """The score of a miner as computed one answer at a time before miner_scores."""
+    score = linear_rewards(None, correct)
+    if correct <= 40:
+        for _ in range(wrong):
+            score = score * 0.99
+        for _ in range(captcha_penalties):
+            score = score * 0.95
+    return score
+
+
+def test_linear_rewards_range():
+    assert linear_rewards(None, -5) == 0
+    assert linear_rewards(None, 0) == 0
+    assert linear_rewards(None, 100) == 0.5 * 65535
+    assert linear_rewards(None, 480) == 65535
+    assert linear_rewards(None, 1000) == 65535
+
+
+def test_miner_scores_match_linear_rewards():
+    correct = [0, 1, 39, 40, 41, 99, 100, 101, 300, 480, 481, 1000]
+    cases = [(c, p, w) for c in correct for p in (0, 1, 7) for w in (0, 3, 60)]
+    correct_answers, captcha_penalties, wrong_answers = (
+        torch.tensor(column) for column in zip(*cases)
+    )
+    scores = miner_scores(correct_answers, captcha_penalties, wrong_answers)
+    expected = torch.tensor([loop_score(*case) for case in cases], dtype=torch.float32)
+    assert torch.allclose(scores, expected, rtol=1e-5)
+
+
+def test_no_penalty_above_40_correct_answers():
+    scores = miner_scores(
+        torch.tensor([40, 41]), torch.tensor([10, 10]), torch.tensor([10, 10])
+    )
+    assert scores[0] < linear_rewards(None, 40)
+    assert scores[1] == torch.tensor(linear_rewards(None, 41), dtype=torch.float32)
+
+
+def test_miner_scores_match_random_miners():
+    generator = torch.Generator().manual_seed(0)
+    correct_answers = torch.randint(0, 500, (1000,), generator=generator)
+    captcha_penalties = torch.randint(0, 20, (1000,), generator=generator)
+    wrong_answers = torch.randint(0, 60, (1000,), generator=generator)
+    scores = miner_scores(correct_answers, captcha_penalties, wrong_answers)
+    expected = torch.tensor(
+        [
+            loop_score(int(c), int(p), int(w))
+            for c, p, w in zip(correct_answers, captcha_penalties, wrong_answers)
+        ],
+        dtype=torch.float32,
+    )
+    assert torch.allclose(scores, expected, rtol=1e-5)
@@ -0,0 +1,71 @@
+import random
+from collections import Counter
+
+import pytest
+
+from hip.validator.scheduler import TaskScheduler
+
+WEIGHTS = {"image": 1, "llm": 1, "captcha": 1, "math": 1}
+
+
+def test_weights_are_normalized():
+    scheduler = TaskScheduler({"image": 3, "math": 1})
+    assert scheduler.weights == {"image": 0.75, "math": 0.25}
+
+
+def test_moving_average_cost():
+    scheduler = TaskScheduler(WEIGHTS, smoothing=0.5)
+    scheduler.record_cost("llm", 10)
+    assert scheduler.costs["llm"] == 10
+    scheduler.record_cost("llm", 20)
+    assert scheduler.costs["llm"] == pytest.approx(15)
+
+
+def test_timed_records_the_generation_cost():
+    scheduler = TaskScheduler(WEIGHTS)
+    generate = scheduler.timed("math", lambda: "task")
+    assert generate() == "task"
+    assert "math" in scheduler.costs
+
+
+def test_only_chooses_types_that_fit_in_the_budget():
+    random.seed(0)
+    scheduler = TaskScheduler(WEIGHTS)
+    scheduler.record_cost("llm", 300)
+    scheduler.record_cost("math", 1)
+    pool_sizes = {"image": 1, "llm": 0, "captcha": 0, "math": 0}
+    chosen = {scheduler.choose(pool_sizes, budget=180) for _ in range(200)}
+    # captcha has no known cost and llm is too slow, neither has a ready task.
+    assert chosen == {"image", "math"}
+
+
+def test_falls_back_to_the_cheapest_type():
+    scheduler = TaskScheduler(WEIGHTS)
+    scheduler.record_cost("llm", 300)
+    scheduler.record_cost("image", 200)
+    assert scheduler.choose({}, budget=100) == "image"
+    assert scheduler.choose({}, budget=None) == "image"
+
+
+def test_served_mix_follows_the_weights():
+    random.seed(0)
+    scheduler = TaskScheduler({"image": 2, "llm": 1, "math": 1}, window=100)
+    pool_sizes = {"image": 1, "llm": 1, "math": 1}
+    for _ in range(400):
+        scheduler.record_served(scheduler.choose(pool_sizes, budget=None))
+    counts = Counter(scheduler.served)
+    assert abs(counts["image"] - 50) <= 5
+    assert abs(counts["llm"] - 25) <= 5
+    assert abs(counts["math"] - 25) <= 5
+    shares = scheduler.stats()
+    assert shares["image"]["target"] == 0.5
+    assert shares["image"]["share"] == counts["image"] / 100
+
+
+def test_deficits_count_the_tasks_behind_the_target():
+    scheduler = TaskScheduler({"image": 1, "math": 1})
+    for _ in range(3):
+        scheduler.record_served("image")
+    deficits = scheduler.deficits()
+    assert deficits["math"] == pytest.approx(2)
+    assert deficits["image"] == pytest.approx(-1)
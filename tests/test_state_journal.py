@@ -0,0 +1,190 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from hip.base.validator import BaseValidatorNeuron
+from hip.validator.history import TaskHistory
+from hip.validator.state_journal import StateJournal
+
+START_TIME = 1_700_000_000
+
+
+class JournalValidator(BaseValidatorNeuron):
+    async def forward(self):
+        pass
+
+
+def make_validator(directory, n=16, snapshot_interval=5):
+    """A validator with only the state used by scoring and saving, without a network."""
+    validator = object.__new__(JournalValidator)
+    validator.config = SimpleNamespace(
+        neuron=SimpleNamespace(
+            history_capacity=256, snapshot_interval=snapshot_interval
+        )
+    )
+    validator.step = 0
+    validator.scores = torch.zeros(n)
+    validator.hotkeys = [f"hotkey-{uid}" for uid in range(n)]
+    validator.tasks_history = TaskHistory(n, capacity=256)
+    validator.state_journal = StateJournal(str(directory), snapshot_interval)
+    return validator
+
+
+def score_steps(validator, steps, seed=0, timestamp=START_TIME):
+    """Scores random answers like update_scores, returns the last timestamp."""
+    rng = random.Random(seed)
+    n = len(validator.scores)
+    for _ in range(steps):
+        timestamp += 300
+        validator.step += 1
+        uids = rng.sample(range(n), min(6, n))
+        correct = [rng.random() < 0.5 for _ in uids]
+        task_type = rng.choice(["captcha", "image", "llm", "math"])
+        validator.score_answers(correct, uids, timestamp, task_type)
+        validator.state_journal.record(
+            validator.step,
+            timestamp,
+            task_type,
+            uids,
+            [validator.hotkeys[uid] for uid in uids],
+            correct,
+        )
+        validator.save_state()
+    return timestamp
+
+
+def test_snapshot_and_replay_match_live_scores(tmp_path):
+    live = make_validator(tmp_path)
+    live.load_state()
+    score_steps(live, 23)
+    # 23 saves with an interval of 5: 4 snapshots and 3 events in the journal.
+    assert (tmp_path / "state.pt").exists()
+    assert len((tmp_path / "journal.jsonl").read_text().splitlines()) == 3
+
+    restored = make_validator(tmp_path)
+    restored.load_state()
+    assert torch.equal(restored.scores, live.scores)
+    assert restored.step == live.step
+    assert restored.state_journal.sequence == live.state_journal.sequence
+    for uid in range(len(live.scores)):
+        assert restored.tasks_history.records(uid) == live.tasks_history.records(uid)
+
+
+def test_save_before_load_does_not_overwrite_state(tmp_path):
+    live = make_validator(tmp_path, snapshot_interval=1)
+    live.load_state()
+    score_steps(live, 3)
+
+    # The validator syncs, and so saves, before it loads its state.
+    restarted = make_validator(tmp_path, snapshot_interval=1)
+    restarted.save_state()
+    restarted.load_state()
+    assert torch.equal(restarted.scores, live.scores)
+
+
+def test_saves_without_events_do_not_snapshot(tmp_path):
+    live = make_validator(tmp_path, snapshot_interval=2)
+    live.load_state()
+    score_steps(live, 1)
+    for _ in range(10):
+        live.save_state()
+    assert not (tmp_path / "state.pt").exists()
+    assert len((tmp_path / "journal.jsonl").read_text().splitlines()) == 1
+    # The second save with an event is the snapshot.
+    score_steps(live, 1, seed=1, timestamp=START_TIME + 300)
+    assert (tmp_path / "state.pt").exists()
+    assert (tmp_path / "journal.jsonl").read_text() == ""
+
+
+def test_snapshot_interval_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        StateJournal(str(tmp_path), snapshot_interval=0)
+
+
+def test_crash_between_snapshot_and_journal_truncation(tmp_path):
+    live = make_validator(tmp_path, snapshot_interval=4)
+    live.load_state()
+    score_steps(live, 3)
+    journal = (tmp_path / "journal.jsonl").read_bytes()
+    # The fourth save writes a snapshot and truncates the journal.
+    score_steps(live, 1, seed=1, timestamp=START_TIME + 3 * 300)
+    assert (tmp_path / "journal.jsonl").read_bytes() == b""
+    # Crash before the truncation: the events are both in the snapshot and the journal.
+    (tmp_path / "journal.jsonl").write_bytes(journal)
+
+    restored = make_validator(tmp_path, snapshot_interval=4)
+    restored.load_state()
+    assert torch.equal(restored.scores, live.scores)
+    for uid in range(len(live.scores)):
+        assert restored.tasks_history.records(uid) == live.tasks_history.records(uid)
+
+
+def test_partial_last_line_is_dropped(tmp_path):
+    live = make_validator(tmp_path, snapshot_interval=100)
+    live.load_state()
+    score_steps(live, 4)
+    journal = (tmp_path / "journal.jsonl").read_bytes()
+    with open(tmp_path / "journal.jsonl", "a") as f:
+        f.write('{"sequence": 5, "step": 5, "timest')
+
+    restored = make_validator(tmp_path, snapshot_interval=100)
+    restored.load_state()
+    assert torch.equal(restored.scores, live.scores)
+    # The partial line is cut, so events saved after the restart are read back.
+    assert (tmp_path / "journal.jsonl").read_bytes() == journal
+    score_steps(restored, 2, seed=2, timestamp=START_TIME + 4 * 300)
+    again = make_validator(tmp_path, snapshot_interval=100)
+    again.load_state()
+    assert torch.equal(again.scores, restored.scores)
+
+
+def test_replay_resets_replaced_hotkeys(tmp_path):
+    live = make_validator(tmp_path, snapshot_interval=2)
+    live.load_state()
+    timestamp = score_steps(live, 2)
+    uid = next(uid for uid in range(16) if live.tasks_history.lengths[uid] > 0)
+
+    # After the snapshot, the uid gets a new hotkey and answers once.
+    live.scores[uid] = 0
+    live.tasks_history.reset(uid)
+    live.hotkeys[uid] = "new-hotkey"
+    live.score_answers([True], [uid], timestamp + 300, "math")
+    live.state_journal.record(
+        live.step, timestamp + 300, "math", [uid], ["new-hotkey"], [True]
+    )
+    live.save_state()
+
+    restored = make_validator(tmp_path, snapshot_interval=2)
+    restored.load_state()
+    assert restored.hotkeys[uid] == "new-hotkey"
+    assert restored.tasks_history.records(uid) == [(True, timestamp + 300, "math")]
+    assert torch.equal(restored.scores, live.scores)
+
+
+def test_replay_grows_the_metagraph(tmp_path):
+    live = make_validator(tmp_path, n=8, snapshot_interval=100)
+    live.load_state()
+    timestamp = score_steps(live, 2)
+    live.save_state()
+
+    # Events for uids the snapshot does not know, after the metagraph grew.
+    live.state_journal.record(
+        live.step,
+        timestamp + 300,
+        "image",
+        [2, 11],
+        ["hotkey-2", "hotkey-11"],
+        [True, True],
+    )
+    live.save_state()
+
+    restored = make_validator(tmp_path, n=8, snapshot_interval=100)
+    restored.load_state()
+    assert len(restored.scores) == 12
+    assert len(restored.tasks_history) == 12
+    assert len(restored.hotkeys) == 12
+    assert restored.hotkeys[11] == "hotkey-11"
+    assert restored.tasks_history.records(11) == [(True, timestamp + 300, "image")]
+    assert restored.scores[11] > 0
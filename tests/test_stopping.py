@@ -0,0 +1,62 @@
+import pytest
+import torch
+
+from hip.validator.stopping import StopCondition, TextStoppingCriteria
+
+
+@pytest.mark.parametrize(
+    "condition, text, expected",
+    [
+        # Cut at the first stop string.
+        (StopCondition(stop_strings=["\n"]), "  First line.\nSecond", "First line."),
+        (StopCondition(stop_strings=["##", "\n"]), "A ## b\nc", "A"),
+        # Leading blank lines are not the end of the paragraph.
+        (
+            StopCondition(paragraph_end=True),
+            "\n\nA paragraph.\n\nNext one.",
+            "A paragraph.",
+        ),
+        # Over the word budget, back to the last complete sentence.
+        (StopCondition(max_words=5), "One two. Three four five six.", "One two."),
+        (
+            StopCondition(max_words=4),
+            'He said "Stop." Then more words.',
+            'He said "Stop."',
+        ),
+        # Without a sentence end within the budget, cut at the budget.
+        (StopCondition(max_words=3), "one two three four", "one two three"),
+        # Within the budget nothing is cut.
+        (StopCondition(max_words=10), " One two. Three", "One two. Three"),
+    ],
+)
+def test_apply(condition, text, expected):
+    assert condition.apply(text) == expected
+
+
+def test_should_stop():
+    condition = StopCondition(max_words=4, paragraph_end=True)
+    assert not condition.should_stop("\n\nOne two")
+    assert condition.should_stop("One two\n\n")
+    assert condition.should_stop("One two three four")
+
+
+class ToyTokenizer:
+    """One token per character, the token 0 being a special token."""
+
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(chr(i) for i in ids.tolist() if i or not skip_special_tokens)
+
+
+def test_criteria_stop_each_row_on_its_own_condition():
+    criteria = TextStoppingCriteria(
+        ToyTokenizer(),
+        prompt_length=2,
+        conditions=[StopCondition(stop_strings=["\n"]), StopCondition(max_words=2)],
+    )
+
+    def call(*texts):
+        input_ids = torch.tensor([[0, ord("p")] + [ord(c) for c in t] for t in texts])
+        return criteria(input_ids, torch.zeros(len(texts), 1)).tolist()
+
+    assert call("a b", "a b") == [False, True]
+    assert call("a b\n", "a b ") == [True, True]
@@ -0,0 +1,132 @@
+import base64
+import os
+
+import pytest
+
+from hip.protocol import TaskSynapse
+from hip.validator import task_bank
+from hip.validator.task_bank import TaskBank, decode_task, encode_task
+
+
+def data_uri(image):
+    return "data:image/png;base64," + base64.b64encode(image).decode("utf-8")
+
+
+def make_task(number, task_type="captcha", image=data_uri(b"\x89PNG\x00\x01")):
+    return TaskSynapse(
+        id=f"{task_type}-{number}",
+        label="What is written in the image?",
+        type="text",
+        options=[] if task_type == "captcha" else ["a", "b"],
+        value="",
+        image=image,
+        answer=f"answer-{number}",
+    )
+
+
+def fill(bank, counts):
+    for task_type, count in counts.items():
+        for number in range(count):
+            bank.append(make_task(number, task_type), task_type)
+
+
+def sample_ids(bank, task_type):
+    ids = []
+    while (task := bank.sample(task_type)) is not None:
+        ids.append(task.id)
+    return ids
+
+
+@pytest.mark.parametrize(
+    "image",
+    [data_uri(b"\x89PNG\x00\x01" * 100), "https://example.com/image.png", ""],
+    ids=["data uri", "url", "no image"],
+)
+def test_encode_decode_round_trip(image):
+    task = make_task(1, image=image)
+    decoded = decode_task(encode_task(task))
+    for field in ("id", "label", "type", "options", "value", "image", "answer"):
+        assert getattr(decoded, field) == getattr(task, field)
+
+
+def test_samples_every_task_once(tmp_path):
+    bank = TaskBank(str(tmp_path / "bank"))
+    fill(bank, {"captcha": 20, "math": 5})
+    assert bank.counts() == {"image": 0, "llm": 0, "captcha": 20, "math": 5}
+    ids = sample_ids(bank, "captcha")
+    assert sorted(ids) == sorted(f"captcha-{i}" for i in range(20))
+    assert bank.counts()["math"] == 5
+    bank.close()
+
+
+def test_served_tasks_stay_served_after_reopening(tmp_path):
+    bank = TaskBank(str(tmp_path / "bank"))
+    fill(bank, {"captcha": 10})
+    served = [bank.sample("captcha").id for _ in range(4)]
+    bank.close()
+
+    reopened = TaskBank(str(tmp_path / "bank"))
+    assert len(reopened) == 10
+    remaining = sample_ids(reopened, "captcha")
+    assert sorted(served + remaining) == sorted(f"captcha-{i}" for i in range(10))
+    reopened.close()
+
+
+def test_compact_keeps_only_unserved_tasks(tmp_path):
+    bank = TaskBank(str(tmp_path / "bank"))
+    fill(bank, {"captcha": 10, "math": 4})
+    served = {bank.sample("captcha").id for _ in range(6)}
+    size = os.path.getsize(bank.data_path)
+    bank.compact()
+    assert len(bank) == 8
+    assert bank.served_size == 0
+    assert os.path.getsize(bank.data_path) < size
+    # Tasks appended after compacting are sampled too.
+    bank.append(make_task(10), "captcha")
+    bank.close()
+
+    reopened = TaskBank(str(tmp_path / "bank"))
+    remaining = set(sample_ids(reopened, "captcha"))
+    assert remaining == {f"captcha-{i}" for i in range(11)} - served
+    assert len(sample_ids(reopened, "math")) == 4
+    reopened.close()
+
+
+@pytest.mark.parametrize("crash_at_replace", [1, 2], ids=["data", "index"])
+def test_interrupted_compaction_is_recovered(tmp_path, monkeypatch, crash_at_replace):
+    bank = TaskBank(str(tmp_path / "bank"))
+    fill(bank, {"captcha": 10})
+    served = {bank.sample("captcha").id for _ in range(3)}
+
+    replaced = []
+    replace = os.replace
+
+    def crashing_replace(source, destination):
+        replaced.append(source)
+        if len(replaced) == crash_at_replace:
+            raise RuntimeError("Crash")
+        replace(source, destination)
+
+    monkeypatch.setattr(task_bank.os, "replace", crashing_replace)
+    with pytest.raises(RuntimeError):
+        bank.compact()
+    monkeypatch.setattr(task_bank.os, "replace", replace)
+
+    # Before the data file is moved in place the old bank is kept, after it the
+    # compacted one is completed.
+    recovered = TaskBank(str(tmp_path / "bank"))
+    assert len(recovered) == (10 if crash_at_replace == 1 else 7)
+    assert not os.path.exists(recovered.data_path + ".tmp")
+    assert not os.path.exists(recovered.index_path + ".tmp")
+    remaining = set(sample_ids(recovered, "captcha"))
+    assert remaining == {f"captcha-{i}" for i in range(10)} - served
+    recovered.close()
+
+
+def test_generator_falls_back_when_the_bank_is_empty(tmp_path):
+    bank = TaskBank(str(tmp_path / "bank"))
+    fill(bank, {"captcha": 1})
+    generate = bank.generator("captcha", lambda: make_task(99))
+    assert generate().id == "captcha-0"
+    assert generate().id == "captcha-99"
+    bank.close()
@@ -0,0 +1,117 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from hip.validator.task_pool import TaskPool
+
+
+def counting_generator(task_type):
+    """A generator of numbered tasks, returning the generator and its call counter."""
+    calls = []
+    lock = threading.Lock()
+
+    def generate():
+        with lock:
+            calls.append(1)
+            return SimpleNamespace(type=task_type, number=len(calls))
+
+    return generate, calls
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_pool_fills_up_to_its_size():
+    generate, calls = counting_generator("math")
+    pool = TaskPool({"math": generate}, size=3)
+    pool.start()
+    try:
+        wait_for(lambda: pool.sizes() == {"math": 3})
+        time.sleep(0.2)
+        # The worker waits with one generated task for room in the full pool.
+        assert len(calls) <= 4
+        assert pool.sizes() == {"math": 3}
+    finally:
+        pool.stop()
+
+
+def test_get_returns_tasks_in_generation_order():
+    generate, _ = counting_generator("math")
+    pool = TaskPool({"math": generate}, size=2)
+    pool.start()
+    try:
+        numbers = [pool.get("math", timeout=5).number for _ in range(5)]
+    finally:
+        pool.stop()
+    assert numbers == [1, 2, 3, 4, 5]
+
+
+def test_get_returns_none_when_nothing_is_ready():
+    def fail():
+        raise RuntimeError("No model")
+
+    pool = TaskPool({"llm": fail}, size=2, retry_delay=0.01)
+    pool.start()
+    try:
+        assert pool.get("llm") is None
+        assert pool.get("llm", timeout=0.1) is None
+    finally:
+        pool.stop()
+
+
+def test_pop_falls_back_to_a_ready_type():
+    generate, _ = counting_generator("math")
+    pool = TaskPool({"math": generate, "llm": lambda: None}, size=1)
+    pool.queues["math"].put(generate())
+    task, task_type = pool.pop("llm")
+    assert task_type == "math"
+    assert task.type == "math"
+    assert pool.pop("llm") == (None, "llm")
+
+
+def test_stop_ends_the_workers():
+    generate, calls = counting_generator("math")
+    pool = TaskPool({"math": generate}, size=1, workers_per_type=2)
+    pool.start()
+    threads = list(pool.threads)
+    assert len(threads) == 2
+    pool.stop()
+    assert not any(thread.is_alive() for thread in threads)
+    generated = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == generated
+
+
+def test_pop_waits_for_the_first_task_of_any_type():
+    model_loaded = threading.Event()
+
+    def slow_image():
+        model_loaded.wait()
+        return SimpleNamespace(type="image")
+
+    def math():
+        time.sleep(0.2)
+        return SimpleNamespace(type="math")
+
+    pool = TaskPool({"image": slow_image, "math": math}, size=1)
+    pool.start()
+    try:
+        start_time = time.monotonic()
+        task, task_type = pool.pop("image", timeout=10)
+        assert task_type == "math"
+        assert task.type == "math"
+        assert time.monotonic() - start_time < 5
+    finally:
+        model_loaded.set()
+        pool.stop()
+
+
+def test_pop_returns_none_after_its_timeout():
+    pool = TaskPool({"image": lambda: None, "math": lambda: None}, size=1)
+    start_time = time.monotonic()
+    assert pool.pop("image", timeout=0.2) == (None, "image")
+    assert time.monotonic() - start_time >= 0.2
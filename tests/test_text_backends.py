@@ -0,0 +1,88 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from hip.validator import text_generator
+from hip.validator.placement import placement
+from hip.validator.text_backends import LlamaCppBackend
+
+VOCAB = 257
+
+
+def next_token_logits():
+    """Logits of the next token given the current one, favouring " Negative"."""
+    logits = np.random.default_rng(0).normal(size=(VOCAB, VOCAB))
+    label = " Negative"
+    for current, following in zip(label, label[1:]):
+        logits[1 + ord(current), 1 + ord(following)] += 10
+    return logits
+
+
+class StubLlama:
+    """
+    A llama_cpp.Llama with one token per byte (after a BOS token 0), whose logits
+    depend on the last token only. Like llama.cpp, the logits of every evaluated
+    position are only kept with logits_all.
+    """
+
+    logits = next_token_logits()
+
+    def __init__(self, model_path, n_threads, n_ctx, verbose, logits_all=False):
+        self.logits_all = logits_all
+        self.n_tokens = 0
+        self.input_ids = np.zeros(n_ctx, dtype=np.intc)
+        self.scores = np.zeros((n_ctx, VOCAB), dtype=np.single)
+
+    def tokenize(self, text):
+        return [0] + [1 + byte for byte in text]
+
+    def eval(self, tokens):
+        for token in tokens:
+            self.input_ids[self.n_tokens] = token
+            if self.logits_all:
+                self.scores[self.n_tokens] = self.logits[token]
+            self.n_tokens += 1
+
+
+def log_probability(sequence, start):
+    """The log-probability of sequence[start:] following sequence[:start]."""
+    total = 0.0
+    for t in range(start, len(sequence)):
+        logits = StubLlama.logits[sequence[t - 1]]
+        total += logits[sequence[t]] - np.logaddexp.reduce(logits)
+    return total
+
+
+@pytest.fixture
+def stub_llama(monkeypatch):
+    monkeypatch.setitem(
+        sys.modules, "llama_cpp", types.SimpleNamespace(Llama=StubLlama)
+    )
+    monkeypatch.setattr(text_generator, "backend_name", "llama_cpp")
+    monkeypatch.setattr(text_generator, "model_name", "stub.gguf")
+    placement.unload("text")
+    yield
+    placement.unload("text")
+
+
+def test_score_continuations_with_a_prefix(stub_llama):
+    backend = LlamaCppBackend("stub.gguf")
+    prefix, prompt = "Context: a\n\n", "Sentiment:"
+    continuations = [" Positive", " Negative", " Neutral"]
+    scores = backend.score_continuations(prompt, continuations, prefix=prefix)
+    prompt_ids = backend.llm.tokenize((prefix + prompt).encode("utf-8"))
+    for continuation, score in zip(continuations, scores):
+        sequence = backend.llm.tokenize((prefix + prompt + continuation).encode())
+        assert score == pytest.approx(log_probability(sequence, len(prompt_ids)))
+    # A second call reuses the evaluated prefix and scores the same.
+    assert backend.score_continuations(
+        prompt, continuations, prefix=prefix
+    ) == pytest.approx(scores)
+
+
+def test_classify_sentiment_on_the_cpu_backend(stub_llama):
+    label, confidence = text_generator.classify_sentiment("A paragraph.")
+    assert label == "Negative"
+    assert 1 / 3 < confidence <= 1